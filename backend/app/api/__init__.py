@@ -1,14 +1,6 @@
 from flask_restful import Api
-import firebase_admin
-from firebase_admin import credentials, firestore
+from backend.app.utils.registry import get_firestore_client
 
 api = Api()
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("app/utils/service-account.json")
-    firebase_admin.initialize_app(cred)
-
-
-client = firestore.client()
-
-from . import agent, vectordb_generator
\ No newline at end of file
+from . import agent, router, vectordb_generator, metrics
\ No newline at end of file
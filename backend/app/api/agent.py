@@ -1,149 +1,420 @@
 import os
 import traceback
-import base64
 import ast
-from flask import request, jsonify, current_app as app
+import json
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from flask import Response, request, jsonify, stream_with_context, current_app as app
 from flask_restful import Resource
 from dotenv import load_dotenv
 from . import *
-import google.generativeai as genai
 
 from backend.app.api.agent_tools import *
+from backend.app.api.router import route_query, is_follow_up, ROUTE_FAST_PATH
 from backend.app.utils.strings import *
-from backend.app.utils.finalizer import extract_final_data
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_google_firestore import FirestoreChatMessageHistory
-from google.cloud import firestore
+from backend.app.utils.finalizer import RENDER_FAILED, extract_final_data, get_rendered_answer, render_final_answer, stream_final_answer
+from backend.app.utils.registry import PERSIST_DIRECTORY, get_chat_model, get_cached_embeddings
+from backend.app.utils.llm_client import guarded
+from backend.app.utils.deadline import request_budget
+from backend.app.utils.metrics import span, request_timings, timing_headers
+from backend.app.utils.response_cache import SemanticResponseCache
+from backend.app.utils.lexical_index import extract_codes
+from backend.app.utils.media import spool_upload
 
 # Loading environment variables
 load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
 
-# Firestore setup
-COLLECTION_NAME = "ai_repair_chat_history"
-client = firestore.Client()
+# Defining tools
+tools = [find_closest_match, get_chat_history]
 
-# Vector DB setup
-current_dir = os.path.dirname(os.path.abspath(__file__))
-persistent_directory = os.path.abspath(os.path.join(current_dir, "..", "..", "data", "vector_database"))
+# Final responses to text-only, first-turn queries, reused for near-identical queries
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    max_distance=float(os.getenv("RESPONSE_CACHE_MAX_DISTANCE", "0.05")),
+    version_path=os.path.join(PERSIST_DIRECTORY, "index_manifest.json")  # Invalidated by vector DB regeneration
+)
+UNCACHEABLE_RESPONSES = {"No response from AI.", "Could not generate description."}
 
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en")
-vector_db = Chroma(persist_directory=persistent_directory, embedding_function=embeddings)
+# Media describers and the chat history prefetch run side by side on this shared pool
+media_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MEDIA_WORKERS", "16")), thread_name_prefix="media")
 
-llm_general = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
+# Per-modality time limits (seconds) before a description is given up on
+MEDIA_TIMEOUTS = {
+    "image": float(os.getenv("IMAGE_DESCRIPTION_TIMEOUT", "30")),
+    "audio": float(os.getenv("AUDIO_DESCRIPTION_TIMEOUT", "45")),
+    "video": float(os.getenv("VIDEO_DESCRIPTION_TIMEOUT", "60"))
+}
 
-# Defining tools
-tools = [find_closest_match, get_chat_history]
+# Every request runs against a deadline (REQUEST_DEADLINE_SECONDS). Media description must leave
+# these reserves for the agent and the finalizer, and a stage isn't started at all with less than
+# its minimum left, so the slowest uploads (video first) are the first to be dropped
+AGENT_RESERVE_SECONDS = float(os.getenv("AGENT_RESERVE_SECONDS", "15"))
+FINALIZER_RESERVE_SECONDS = float(os.getenv("FINALIZER_RESERVE_SECONDS", "8"))
+MIN_STAGE_SECONDS = {"image": 5, "audio": 8, "video": 15, "agent": 5, "finalizer": 3}
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "6"))
+AGENT_STOPPED_PREFIX = "Agent stopped due to"  # AgentExecutor's answer when it hits a limit
 
-custom_prompt = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate.from_template(system_text44),
-    HumanMessagePromptTemplate.from_template(
-        "User ID: {user_id}, Query: {input}, Image Description: {image}, Audio Description: {audio}, Video Description: {video}"
-    )
-])
 
-# Creating Agent
-agent = create_react_agent(llm_general, tools, custom_prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+@lru_cache(maxsize=None)
+def get_agent():
+    """Builds the ReAct agent on first use, so importing this module doesn't load LangChain's agent stack."""
+    from langchain.agents import create_react_agent
+    from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
+    custom_prompt = ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(system_text44),
+        HumanMessagePromptTemplate.from_template(
+            "User ID: {user_id}, Query: {input}, Image Description: {image}, Audio Description: {audio}, Video Description: {video}"
+        )
+    ])
 
-def convert_to_base64(file):
-    """Converts uploaded file to a base64 string."""
-    return base64.b64encode(file.read()).decode("utf-8") if file else None
+    # Creating Agent. Each of its LLM calls goes through llm_client; the stop sequence is bound here,
+    # since the guarded model is a plain runnable
+    model = guarded(get_chat_model("gemini-2.0-flash"), stop=["\nObservation"])
+    return create_react_agent(model, tools, custom_prompt, stop_sequence=False)
 
-def google_ai_python_sdk_for_gemini_api(input):
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(
-        f"""From the following code, give me every step and any sort of title and description related to that step, and any image links related to that step too. Also, give me the embed code, and the tools required as well. Your response should be as if you're an AI Repair Agent.
 
-        {input}
-        """
+def get_agent_executor(max_execution_time=None):
+    """An executor for one request, stopped after AGENT_MAX_ITERATIONS steps or max_execution_time seconds.
+
+    Intermediate steps are returned so callers can tell which tools the agent used.
+    """
+    from langchain.agents import AgentExecutor
+    return AgentExecutor(
+        agent=get_agent(), tools=tools, verbose=True, handle_parsing_errors=True,
+        max_iterations=AGENT_MAX_ITERATIONS, max_execution_time=max_execution_time,
+        return_intermediate_steps=True
     )
-    return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate description."
 
-class MainAgent(Resource):
-    def post(self):
+
+def google_ai_python_sdk_for_gemini_api(input):
+    return render_final_answer(input)
+
+def describe_and_close(describer, media_file):
+    """Runs a describer on a spooled upload and releases the upload (and its temp file) afterwards."""
+    try:
+        return describer(media_file)
+    finally:
+        media_file.close()
+
+def media_window(budget):
+    """Seconds the media describers may take without eating into the agent's and finalizer's reserves."""
+    return budget.remaining() - AGENT_RESERVE_SECONDS - FINALIZER_RESERVE_SECONDS
+
+def media_time_limits(budget):
+    return {modality: min(timeout, media_window(budget)) for modality, timeout in MEDIA_TIMEOUTS.items()}
+
+def plan_media(media, budget):
+    """Drops the uploads that can't be described within the request budget.
+
+    Returns (media to describe, placeholder descriptions of the dropped ones).
+    """
+    window = media_window(budget)
+    planned, skipped = {}, {}
+    for modality, (describer, payload) in media.items():
+        if payload and window < MIN_STAGE_SECONDS[modality]:
+            payload.close()
+            budget.degrade(f"{modality}_description", "skipped")
+            skipped[modality] = f"{modality.capitalize()} description skipped to stay within the time limit."
+        else:
+            planned[modality] = (describer, payload)
+    return planned, skipped
+
+def describe_media_concurrently(media, budget=None):
+    """Runs the describers for {modality: (describer, payload)} concurrently.
+
+    Each modality gets its own time limit, counted from when the batch started and capped by the
+    request budget. A modality that times out or fails gets a placeholder description, while the
+    others still return theirs.
+    """
+    started_at = time.monotonic()
+    time_limits = media_time_limits(budget) if budget else MEDIA_TIMEOUTS
+    futures = {
+        # Each describer runs in a copy of this context, so its LLM calls see the request deadline
+        modality: media_executor.submit(contextvars.copy_context().run, describe_and_close, describer, payload)
+        for modality, (describer, payload) in media.items()
+    }
+
+    descriptions = {}
+    for modality, future in futures.items():
+        remaining = time_limits[modality] - (time.monotonic() - started_at)
         try:
-            user_id = request.form.get("user_id", "Unknown User")
-            query = request.form.get("query", "")
-            image_file = request.files.get("image")
-            audio_file = request.files.get("audio")
-            video_file = request.files.get("video")
-
-            image_description = "No Image Provided"
-            audio_description = "No Audio Provided"
-            video_description = "No Video Provided"
-
-            if image_file:
-                image_bytes = convert_to_base64(image_file)
-                image_description = describe_image(image_bytes) if image_bytes else "Couldn't convert to base64 successfully."
-            
-            print("Image description:", image_description)
-
-            if audio_file:
-                audio_bytes = convert_to_base64(audio_file)
-                audio_description = describe_audio(audio_bytes) if audio_bytes else "Couldn't convert to base64 successfully."
-            
-            print("Audio description:", audio_description)
-
-            if video_file:
-                video_bytes = convert_to_base64(video_file)
-                video_description = describe_video(video_bytes) if video_bytes else "Couldn't convert to base64 successfully."
-            
-            print("Video description:", video_description)
-
-            # Firestore chat history setup
-            chat_history = FirestoreChatMessageHistory(
-                session_id=str(user_id), collection=COLLECTION_NAME, client=client
-            )
-            
-            if query:
-                chat_history.add_user_message(query)
-            
-            # Preparing agent input
-            agent_input = {
-                "user_id": user_id,
-                "input": query if query else "No Query Provided",
-                "image": image_description,
-                "audio": audio_description,
-                "video": video_description
-            }
-
-            # Calling agent
-            agent_response = agent_executor.invoke(agent_input)
-
-            # Extracting text response from the agent's output dictionary
-            output_text = agent_response.get("output", "")  # Get text or empty string
-
-            print("Output_text:", output_text)
+            descriptions[modality] = future.result(timeout=max(0, remaining))
+        except FutureTimeoutError:
+            future.cancel()
+            app.logger.warning(f"{modality.capitalize()} description timed out after {time_limits[modality]:.1f}s")
+            if budget:
+                budget.degrade(f"{modality}_description", "timed_out")
+            descriptions[modality] = f"{modality.capitalize()} description timed out."
+        except Exception as e:
+            app.logger.error(f"{modality.capitalize()} description failed: {e}")
+            descriptions[modality] = f"Could not generate {modality} description."
+    return descriptions
 
-            try:
-                check_dict = ast.literal_eval(output_text)
-            except (ValueError, SyntaxError):
-                check_dict = output_text  
+def read_request():
+    """Reads the form fields and spools the uploads while the request context is still active."""
+    user_id = request.form.get("user_id", "Unknown User")
+    query = request.form.get("query", "")
+    image_file = request.files.get("image")
+    audio_file = request.files.get("audio")
+    video_file = request.files.get("video")
+
+    media = {}
+    describers = {"image": (image_file, describe_image), "audio": (audio_file, describe_audio), "video": (video_file, describe_video)}
+    for modality, (file, describer) in describers.items():
+        if file:
+            # Large uploads go to a temp file instead of RAM and are passed to the describers as a stream
+            media[modality] = (describer, spool_upload(file))
+    return user_id, query, media
+
+def fill_descriptions(media, descriptions):
+    """Adds placeholders for missing descriptions; returns the (image, audio, video) descriptions."""
+    for modality in media:
+        descriptions.setdefault(modality, f"Empty {modality} upload received.")
+
+    image_description = descriptions.get("image", "No Image Provided")
+    audio_description = descriptions.get("audio", "No Audio Provided")
+    video_description = descriptions.get("video", "No Video Provided")
+
+    print("Image description:", image_description)
+    print("Audio description:", audio_description)
+    print("Video description:", video_description)
+
+    return image_description, audio_description, video_description
+
+def build_agent_input(user_id, query, image_description, audio_description, video_description):
+    return {
+        "user_id": user_id,
+        "input": query if query else "No Query Provided",
+        "image": image_description,
+        "audio": audio_description,
+        "video": video_description
+    }
+
+def parse_agent_output(agent_response):
+    """Returns (output text, parsed output). The agent answers with guide metadata as a dict literal when it found one."""
+    # Extracting text response from the agent's output dictionary
+    output_text = agent_response.get("output", "")  # Get text or empty string
+
+    print("Output_text:", output_text)
+
+    try:
+        return output_text, ast.literal_eval(output_text)
+    except (ValueError, SyntaxError):
+        return output_text, output_text
+
+def used_chat_history(agent_response):
+    """Whether the agent read the user's history, which makes its answer specific to this user."""
+    return any(action.tool == get_chat_history.name for action, _ in agent_response.get("intermediate_steps", []))
 
-            if isinstance(check_dict, dict) and "filename" in check_dict:
-                final_response = google_ai_python_sdk_for_gemini_api(extract_final_data(check_dict))
+def agent_time_limit(budget):
+    """Seconds the agent may run for, or None (recorded as a skipped stage) if that's too little to start it."""
+    time_limit = budget.remaining() - FINALIZER_RESERVE_SECONDS
+    if time_limit < MIN_STAGE_SECONDS["agent"]:
+        budget.degrade("agent", "skipped")
+        return None
+    return time_limit
+
+def agent_cut_short(output_text, budget):
+    if output_text.startswith(AGENT_STOPPED_PREFIX):
+        budget.degrade("agent", "cut_short")
+        return True
+    return False
+
+def fallback_match(query, provided_descriptions):
+    """The top search match within the tool's threshold, answered when the agent was skipped or cut short."""
+    search_text = "\n".join(part for part in (query, *provided_descriptions) if part)
+    if not search_text.strip():
+        return None
+    metadata, score = search_closest_match(search_text)
+    return metadata if metadata is not None and score <= SCORE_THRESHOLD else None
+
+def finalizer_skipped(budget):
+    if budget.remaining() < MIN_STAGE_SECONDS["finalizer"]:
+        budget.degrade("finalizer", "skipped")
+        return True
+    return False
+
+def has_earlier_turns(history, budget):
+    """Whether the session already has turns, from the prefetched history; assumed so if it can't be read in time."""
+    try:
+        return bool(history.result(timeout=budget.remaining()))
+    except Exception as e:
+        app.logger.warning(f"Chat history prefetch failed, treating the request as a follow-up: {e}")
+        return True
+
+def finish_turn(user_id, query, final_response, cacheable, query_embedding):
+    """Records the turn in chat history and the response cache; returns the JSON-safe response."""
+    # The user and AI messages are persisted together in the background
+    history_store.append_turn(user_id, query, str(final_response))
+
+    if cacheable and isinstance(final_response, str) and final_response not in UNCACHEABLE_RESPONSES:
+        response_cache.store(query_embedding, final_response, extract_codes(query))
+
+    if not isinstance(final_response, (dict, str, list)):
+        final_response = str(final_response)
+    return final_response
+
+def as_token(final_response):
+    return final_response if isinstance(final_response, str) else json.dumps(final_response)
+
+def answer_events(user_id, query, media, budget, stream_answer=False):
+    """Runs a request through the pipeline, yielding (event, data) as each stage finishes.
+
+    Events, in order: "media" (descriptions, only when media was uploaded), "route" (the route taken),
+    "guide" (the matched guide, if any), "token" (answer text chunks, only with stream_answer) and
+    finally "done" with the full response and the stages degraded to stay within the budget.
+    """
+    # Recent history is fetched into the session cache alongside the media describers,
+    # so the agent's get_chat_history call is served from memory
+    history = media_executor.submit(history_store.recent, user_id)
+
+    with span("media"):
+        planned, descriptions = plan_media(media, budget)
+        descriptions.update(describe_media_concurrently(
+            {modality: (describer, payload) for modality, (describer, payload) in planned.items() if payload}, budget
+        ))
+    image_description, audio_description, video_description = fill_descriptions(media, descriptions)
+
+    if media:
+        yield "media", {modality: descriptions[modality] for modality in media}
+
+    # Text-only queries that don't depend on earlier turns can be answered from the semantic cache
+    has_history = has_earlier_turns(history, budget)
+    cacheable = bool(query.strip()) and not media and not has_history and not is_follow_up(query)
+    query_embedding = None
+    if cacheable:
+        with span("semantic_cache"):
+            query_embedding = get_cached_embeddings().embed_query(query)
+            cached_response = response_cache.lookup(query_embedding, extract_codes(query))
+        if cached_response is not None:
+            app.logger.info("Served response from the semantic cache")
+            history_store.append_turn(user_id, query, cached_response)
+            if stream_answer:
+                yield "token", cached_response
+            yield "done", {"response": cached_response, "degraded": budget.degraded}
+            return
+
+    # Plain, confidently matched queries are answered straight from the vector DB
+    provided_descriptions = [descriptions[modality] for modality in media]
+    with span("route"):
+        route, matched_guide = route_query(query, provided_descriptions, has_history)
+    app.logger.info(f"Routed request to {route}")
+    yield "route", {"route": route}
+
+    output_text = ""
+    if route == ROUTE_FAST_PATH:
+        check_dict = matched_guide
+    else:
+        # Calling agent, within what's left of the budget; without time for it, the top search match is answered
+        time_limit = agent_time_limit(budget)
+        if time_limit is None:
+            check_dict = fallback_match(query, provided_descriptions)
+        else:
+            agent_input = build_agent_input(user_id, query, image_description, audio_description, video_description)
+            with span("agent"):
+                agent_response = get_agent_executor(time_limit).invoke(agent_input)
+            output_text, check_dict = parse_agent_output(agent_response)
+            # Answers built on this user's history must never be served to someone else from the cache
+            cacheable = cacheable and not used_chat_history(agent_response)
+            if agent_cut_short(output_text, budget):
+                output_text, check_dict = "", fallback_match(query, provided_descriptions)
+
+    streamed = False
+    if isinstance(check_dict, dict) and "filename" in check_dict:
+        yield "guide", {"filename": check_dict["filename"], "title": check_dict.get("title")}
+
+        # Answers rendered at index time are served without an LLM call. Otherwise the guide is
+        # formatted by Gemini, or returned as its raw fields if there's no time left for that
+        final_response = get_rendered_answer(check_dict)
+        if final_response is None:
+            final_data = extract_final_data(check_dict)
+            if finalizer_skipped(budget):
+                final_response = final_data
+            elif stream_answer:
+                chunks = []
+                try:
+                    with span("finalizer"):
+                        for chunk in stream_final_answer(final_data):
+                            chunks.append(chunk)
+                            yield "token", chunk
+                    final_response = clean_text("".join(chunks)) if chunks else RENDER_FAILED
+                except Exception as e:
+                    app.logger.error(f"Final answer formatting failed: {e}")
+                    budget.degrade("finalizer", "cut_short" if chunks else "failed")
+                    final_response = clean_text("".join(chunks)) if chunks else final_data
+                streamed = bool(chunks)
             else:
-                final_response = clean_text(output_text) if output_text else "No response from AI."
+                try:
+                    with span("finalizer"):
+                        final_response = google_ai_python_sdk_for_gemini_api(final_data)
+                except Exception as e:
+                    app.logger.error(f"Final answer formatting failed: {e}")
+                    budget.degrade("finalizer", "failed")
+                    final_response = final_data
+    else:
+        final_response = clean_text(output_text) if output_text else "No response from AI."
+
+    # Degraded answers aren't cached, so the next asker gets the full one
+    final_response = finish_turn(user_id, query, final_response, cacheable and not budget.degraded, query_embedding)
 
-            chat_history.add_ai_message(str(final_response))
+    if stream_answer and not streamed:
+        yield "token", as_token(final_response)
+    yield "done", {"response": final_response, "degraded": budget.degraded}
 
-            if not isinstance(final_response, (dict, str, list)):
-                final_response = str(final_response)  
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-            return {"response": final_response}, 200
+class MainAgent(Resource):
+    def post(self):
+        try:
+            user_id, query, media = read_request()
+            with request_timings() as timings, request_budget() as budget:
+                with span("main_agent"):
+                    for event, data in answer_events(user_id, query, media, budget):
+                        if event == "done":
+                            break
+                return data, 200, timing_headers(timings)
 
         except Exception as e:
             app.logger.error(f"Exception occurred: {e}")
             app.logger.error(traceback.format_exc())
             return {"Error": "Failed to process request"}, 500
 
+class MainAgentStream(Resource):
+    """Server-Sent Events variant of /main_agent.
+
+    Emits each pipeline stage as it finishes, then the answer text as Gemini generates it. The
+    "done" event carries the full, cleaned response, which is what gets saved to chat history.
+    """
+
+    def post(self):
+        try:
+            user_id, query, media = read_request()
+        except Exception as e:
+            app.logger.error(f"Exception occurred: {e}")
+            return {"Error": "Failed to process request"}, 500
+
+        def events():
+            try:
+                # No Server-Timing header here: headers are sent before the first stage runs
+                with request_budget() as budget, span("main_agent_stream"):
+                    for event, data in answer_events(user_id, query, media, budget, stream_answer=True):
+                        yield format_sse(event, data)
+            except Exception as e:
+                app.logger.error(f"Exception occurred: {e}")
+                app.logger.error(traceback.format_exc())
+                yield format_sse("error", {"Error": "Failed to process request"})
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Stop proxies from buffering the stream
+        )
+
 
 api.add_resource(MainAgent, "/main_agent")
+api.add_resource(MainAgentStream, "/main_agent/stream")
@@ -0,0 +1,240 @@
+"""asyncio-native request path for the main agent, served by backend/asgi.py.
+
+Runs the same pipeline as agent.answer_events, but Gemini, Vertex and Firestore calls are awaited
+instead of holding a worker thread, so one worker process can keep hundreds of conversations in
+flight. Local CPU work (query embedding, vector/BM25 search, OCR, SQLite lookups) runs in the
+default thread pool.
+"""
+import asyncio
+import logging
+import traceback
+
+from starlette.datastructures import UploadFile
+from starlette.responses import JSONResponse, StreamingResponse
+
+from backend.app.api.agent import (
+    MEDIA_TIMEOUTS, response_cache, get_agent_executor, fill_descriptions, build_agent_input,
+    parse_agent_output, finish_turn, as_token, format_sse, media_time_limits, plan_media,
+    agent_time_limit, agent_cut_short, used_chat_history, fallback_match, finalizer_skipped
+)
+from backend.app.api.agent_tools import history_store, describe_image_async, describe_audio_async, describe_video_async, clean_text
+from backend.app.api.router import route_query, is_follow_up, ROUTE_FAST_PATH
+from backend.app.utils.finalizer import RENDER_FAILED, extract_final_data, get_rendered_answer, render_final_answer_async, stream_final_answer_async
+from backend.app.utils.registry import get_cached_embeddings
+from backend.app.utils.lexical_index import extract_codes
+from backend.app.utils.media import spool_upload
+from backend.app.utils.deadline import request_budget
+from backend.app.utils.metrics import span, request_timings, timing_headers
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DESCRIBERS = {"image": describe_image_async, "audio": describe_audio_async, "video": describe_video_async}
+
+# Fire-and-forget tasks are referenced here until they finish, so they aren't garbage collected mid-flight
+background_tasks = set()
+
+
+async def read_request(request):
+    """Async counterpart of agent.read_request."""
+    form = await request.form()
+    user_id = form.get("user_id", "Unknown User")
+    query = form.get("query", "")
+
+    media = {}
+    for modality, describer in ASYNC_DESCRIBERS.items():
+        upload = form.get(modality)
+        if isinstance(upload, UploadFile) and upload.filename:
+            # Copied out of the request, since Starlette closes the form's files once the response is sent
+            media[modality] = (describer, await asyncio.to_thread(spool_upload, upload.file))
+    return user_id, query, media
+
+
+async def describe_and_close(describer, media_file):
+    try:
+        return await describer(media_file)
+    finally:
+        media_file.close()
+
+
+async def describe_media_concurrently(media, budget=None):
+    """Async counterpart of agent.describe_media_concurrently. A timed-out describer is cancelled."""
+    time_limits = media_time_limits(budget) if budget else MEDIA_TIMEOUTS
+
+    async def describe(modality, describer, payload):
+        try:
+            return await asyncio.wait_for(describe_and_close(describer, payload), max(0, time_limits[modality]))
+        except asyncio.TimeoutError:
+            logger.warning(f"{modality.capitalize()} description timed out after {time_limits[modality]:.1f}s")
+            if budget:
+                budget.degrade(f"{modality}_description", "timed_out")
+            return f"{modality.capitalize()} description timed out."
+        except Exception as e:
+            logger.error(f"{modality.capitalize()} description failed: {e}")
+            return f"Could not generate {modality} description."
+
+    modalities = list(media)
+    results = await asyncio.gather(*(describe(modality, *media[modality]) for modality in modalities))
+    return dict(zip(modalities, results))
+
+
+async def prefetch_history(user_id):
+    """The session's recent messages, or None if they couldn't be read."""
+    try:
+        return await history_store.arecent(user_id)
+    except Exception as e:
+        logger.warning(f"Chat history prefetch failed: {e}")
+        return None
+
+
+async def has_earlier_turns(history, budget):
+    """Async counterpart of agent.has_earlier_turns, for the prefetch task."""
+    try:
+        messages = await asyncio.wait_for(asyncio.shield(history), budget.remaining())
+    except asyncio.TimeoutError:
+        messages = None
+    if messages is None:
+        logger.warning("Chat history unavailable, treating the request as a follow-up")
+        return True
+    return bool(messages)
+
+
+async def answer_events_async(user_id, query, media, budget, stream_answer=False):
+    """Async counterpart of agent.answer_events; yields the same (event, data) sequence."""
+    # Recent history is fetched into the session cache alongside the media describers
+    task = asyncio.create_task(prefetch_history(user_id))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    with span("media"):
+        planned, descriptions = plan_media(media, budget)
+        descriptions.update(await describe_media_concurrently(
+            {modality: (describer, payload) for modality, (describer, payload) in planned.items() if payload}, budget
+        ))
+    image_description, audio_description, video_description = fill_descriptions(media, descriptions)
+
+    if media:
+        yield "media", {modality: descriptions[modality] for modality in media}
+
+    # Text-only queries that don't depend on earlier turns can be answered from the semantic cache
+    has_history = await has_earlier_turns(task, budget)
+    cacheable = bool(query.strip()) and not media and not has_history and not is_follow_up(query)
+    query_embedding = None
+    if cacheable:
+        with span("semantic_cache"):
+            query_embedding = await asyncio.to_thread(get_cached_embeddings().embed_query, query)
+            cached_response = response_cache.lookup(query_embedding, extract_codes(query))
+        if cached_response is not None:
+            logger.info("Served response from the semantic cache")
+            history_store.append_turn(user_id, query, cached_response)
+            if stream_answer:
+                yield "token", cached_response
+            yield "done", {"response": cached_response, "degraded": budget.degraded}
+            return
+
+    # Plain, confidently matched queries are answered straight from the vector DB
+    provided_descriptions = [descriptions[modality] for modality in media]
+    with span("route"):
+        route, matched_guide = await asyncio.to_thread(route_query, query, provided_descriptions, has_history)
+    logger.info(f"Routed request to {route}")
+    yield "route", {"route": route}
+
+    output_text = ""
+    if route == ROUTE_FAST_PATH:
+        check_dict = matched_guide
+    else:
+        # Sync tools (the vector search) run in a thread pool; get_chat_history is awaited
+        time_limit = agent_time_limit(budget)
+        if time_limit is None:
+            check_dict = await asyncio.to_thread(fallback_match, query, provided_descriptions)
+        else:
+            agent_input = build_agent_input(user_id, query, image_description, audio_description, video_description)
+            with span("agent"):
+                agent_response = await get_agent_executor(time_limit).ainvoke(agent_input)
+            output_text, check_dict = parse_agent_output(agent_response)
+            # Answers built on this user's history must never be served to someone else from the cache
+            cacheable = cacheable and not used_chat_history(agent_response)
+            if agent_cut_short(output_text, budget):
+                output_text = ""
+                check_dict = await asyncio.to_thread(fallback_match, query, provided_descriptions)
+
+    streamed = False
+    if isinstance(check_dict, dict) and "filename" in check_dict:
+        yield "guide", {"filename": check_dict["filename"], "title": check_dict.get("title")}
+
+        # Answers rendered at index time are served without an LLM call
+        final_response = await asyncio.to_thread(get_rendered_answer, check_dict)
+        if final_response is None:
+            final_data = await asyncio.to_thread(extract_final_data, check_dict)
+            if finalizer_skipped(budget):
+                final_response = final_data
+            elif stream_answer:
+                chunks = []
+                try:
+                    with span("finalizer"):
+                        async for chunk in stream_final_answer_async(final_data):
+                            chunks.append(chunk)
+                            yield "token", chunk
+                    final_response = clean_text("".join(chunks)) if chunks else RENDER_FAILED
+                except Exception as e:
+                    logger.error(f"Final answer formatting failed: {e}")
+                    budget.degrade("finalizer", "cut_short" if chunks else "failed")
+                    final_response = clean_text("".join(chunks)) if chunks else final_data
+                streamed = bool(chunks)
+            else:
+                try:
+                    with span("finalizer"):
+                        final_response = await render_final_answer_async(final_data)
+                except Exception as e:
+                    logger.error(f"Final answer formatting failed: {e}")
+                    budget.degrade("finalizer", "failed")
+                    final_response = final_data
+    else:
+        final_response = clean_text(output_text) if output_text else "No response from AI."
+
+    final_response = finish_turn(user_id, query, final_response, cacheable and not budget.degraded, query_embedding)
+
+    if stream_answer and not streamed:
+        yield "token", as_token(final_response)
+    yield "done", {"response": final_response, "degraded": budget.degraded}
+
+
+async def main_agent(request):
+    """POST /main_agent on the asyncio path; same form fields and responses as agent.MainAgent."""
+    try:
+        user_id, query, media = await read_request(request)
+        with request_timings() as timings, request_budget() as budget:
+            with span("main_agent"):
+                async for event, data in answer_events_async(user_id, query, media, budget):
+                    if event == "done":
+                        break
+            return JSONResponse(data, headers=timing_headers(timings))
+
+    except Exception as e:
+        logger.error(f"Exception occurred: {e}")
+        logger.error(traceback.format_exc())
+        return JSONResponse({"Error": "Failed to process request"}, status_code=500)
+
+
+async def main_agent_stream(request):
+    """POST /main_agent/stream on the asyncio path; same events as agent.MainAgentStream."""
+    try:
+        user_id, query, media = await read_request(request)
+    except Exception as e:
+        logger.error(f"Exception occurred: {e}")
+        return JSONResponse({"Error": "Failed to process request"}, status_code=500)
+
+    async def events():
+        try:
+            with request_budget() as budget, span("main_agent_stream"):
+                async for event, data in answer_events_async(user_id, query, media, budget, stream_answer=True):
+                    yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Exception occurred: {e}")
+            logger.error(traceback.format_exc())
+            yield format_sse("error", {"Error": "Failed to process request"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
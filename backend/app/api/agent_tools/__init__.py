@@ -1,5 +1,5 @@
-from .history_retrieval import get_chat_history, COLLECTION_NAME
-from .audio_description import describe_audio, clean_text
-from .image_description import describe_image, extract_text_from_image, clean_text
-from .search import find_closest_match
-from .video_description import describe_video, clean_text
\ No newline at end of file
+from .history_retrieval import get_chat_history, history_store, COLLECTION_NAME
+from .audio_description import describe_audio, describe_audio_async, clean_text
+from .image_description import describe_image, describe_image_async, extract_text_from_image, clean_text
+from .search import find_closest_match, search_closest_match, SCORE_THRESHOLD
+from .video_description import describe_video, describe_video_async, clean_text
\ No newline at end of file
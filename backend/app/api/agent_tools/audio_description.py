@@ -1,13 +1,14 @@
 from backend.app.api import *
-import google.generativeai as genai
-import base64
 import re
-from dotenv import load_dotenv
-import os
+import asyncio
+from backend.app.utils.registry import get_generative_model
+from backend.app.utils.media import read_media
+from backend.app.utils.description_cache import cached_description
+from backend.app.utils.llm_client import llm_client
+from backend.app.utils.metrics import timed
 
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+AUDIO_MODEL = "gemini-1.5-pro"  # audio input only supported here
+AUDIO_PROMPT = "Describe the audio in detail. Identify the appliance or object involved, model if possible, and any technical issues or context. Break down the sounds or speech in a structured way."
 
 def clean_text(text):
     """Cleans LLM-generated text while preserving actual content."""
@@ -18,19 +19,36 @@ def clean_text(text):
     text = re.sub(r"<.*?>", "", text)
     return text.strip()
 
-def describe_audio(audio: str):
-    """Takes base64-encoded MP3 audio and uses Gemini to describe it."""
-
-    audio_bytes = base64.b64decode(audio)
-
-    model = genai.GenerativeModel("gemini-1.5-pro")  # audio input only supported here
-
-    response = model.generate_content([
-        "Describe the audio in detail. Identify the appliance or object involved, model if possible, and any technical issues or context. Break down the sounds or speech in a structured way.",
+def audio_content(audio):
+    audio_bytes = read_media(audio)  # The SDK only takes inline bytes, so this is the single in-memory copy
+    return [
+        AUDIO_PROMPT,
         {
             "mime_type": "audio/mpeg",
             "data": audio_bytes
         }
-    ])
+    ]
+
+@timed("audio_description")
+@cached_description("audio", AUDIO_MODEL, AUDIO_PROMPT)
+def describe_audio(audio):
+    """Takes MP3 audio (file-like object, bytes/memoryview or base64 string) and uses Gemini to describe it."""
+
+    model = get_generative_model(AUDIO_MODEL)
+
+    content = audio_content(audio)
+    response = llm_client.call(lambda timeout: model.generate_content(content, request_options={"timeout": timeout}))
+
+    return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate description."
+
+@timed("audio_description")
+@cached_description("audio", AUDIO_MODEL, AUDIO_PROMPT)
+async def describe_audio_async(audio):
+    """Async version of describe_audio, for the asyncio request path."""
+
+    model = get_generative_model(AUDIO_MODEL)
+
+    content = await asyncio.to_thread(audio_content, audio)  # Reads the whole upload, so off the event loop
+    response = await llm_client.acall(lambda timeout: model.generate_content_async(content, request_options={"timeout": timeout}))
 
     return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate description."
@@ -1,18 +1,45 @@
 from backend.app.api import *
-from langchain.agents import tool
-from langchain_google_firestore import FirestoreChatMessageHistory
+from langchain_core.tools import StructuredTool
+from backend.app.utils.registry import get_async_firestore_client
+from backend.app.utils.chat_history import ChatHistoryStore, FirestoreHistoryBackend, InMemoryHistoryBackend
+from backend.app.utils.prompt_compaction import compact_history
+from backend.app.utils.metrics import timed
+import os
 
 COLLECTION_NAME = "ai_repair_chat_history"
 
-@tool
-def get_chat_history(user_id):
+# CHAT_HISTORY_BACKEND=memory keeps history in-process, e.g. for tests without Firestore
+if os.getenv("CHAT_HISTORY_BACKEND", "firestore") == "memory":
+    history_backend = InMemoryHistoryBackend()
+else:
+    history_backend = FirestoreHistoryBackend(get_firestore_client, COLLECTION_NAME, get_async_firestore_client)
+
+history_store = ChatHistoryStore(
+    history_backend,
+    cache_size=int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "20")),
+    max_sessions=int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "10000")),
+    cache_ttl=float(os.getenv("CHAT_HISTORY_CACHE_TTL", "300"))
+)
+
+@timed("chat_history")
+def read_chat_history(user_id):
     """Retrieves the chat history for the given user from Firestore Database."""
-    chat_history = FirestoreChatMessageHistory(
-        session_id=str(user_id), collection=COLLECTION_NAME, client=client
-    )
-    if not chat_history.messages:
+    last_5_messages = history_store.recent(user_id, 5)
+    if not last_5_messages:
+        return "No chat history found."
+
+    # One "type: content" line per message, within the history token budget
+    return compact_history(last_5_messages)
+
+@timed("chat_history")
+async def aread_chat_history(user_id):
+    last_5_messages = await history_store.arecent(user_id, 5)
+    if not last_5_messages:
         return "No chat history found."
-    
-    last_5_messages = chat_history.messages[-5:]
 
-    return last_5_messages
\ No newline at end of file
+    return compact_history(last_5_messages)
+
+# Runs read_chat_history on the sync path and aread_chat_history when the agent is awaited
+get_chat_history = StructuredTool.from_function(
+    func=read_chat_history, coroutine=aread_chat_history, name="get_chat_history"
+)
@@ -1,17 +1,17 @@
-from langchain_google_genai import ChatGoogleGenerativeAI # LangChain wrapper for Google's Gemini chat models.
-import google.generativeai as genai # Official Python SDK for Google's Gemini API (direct).
-import base64 # For decoding image strings sent in base64 (likely via API or frontend).
-import pytesseract # Python binding for Tesseract OCR — used to extract text from images.
-from PIL import Image # Python Imaging Library — used to open and manipulate images
-import io # Needed to convert bytes into something PIL can understand
+from backend.app.utils.registry import get_chat_model, get_generative_model # Shared Gemini clients (LangChain wrapper and direct SDK)
+from backend.app.utils.media import as_binary_stream # Accepts file-like objects, bytes/memoryviews or base64 strings
+from backend.app.utils.description_cache import cached_description # Content-addressed cache for repeated uploads
+from backend.app.utils.ocr import extract_text # Preprocessed OCR, run in a process pool off the request thread
+from backend.app.utils.llm_client import llm_client # Rate limiting, retries, deadlines and circuit breaking for every Gemini call
+from backend.app.utils.metrics import span, timed # Per-stage latency for /metrics
 import re # For regex-based cleanup
-import os
-from dotenv import load_dotenv # To securely load GOOGLE_API_KEY from .env
+import asyncio # For the async describer used by the ASGI entry point
 
-# Load env vars
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+IMAGE_MODEL = "gemini-2.0-flash"
+VISION_PROMPT = "Describe this image. What appliance is it, what model, and what issue might it have? Be specific and technical."
+COMBINED_PROMPT = "Using both the OCR and visual info, describe the appliance, its model (if possible), and the issue. Be specific and technical. If uncertain, make an educated guess and explain."
+
+# PIL (and pytesseract, in the OCR workers) are imported inside the functions that use them, so they only load on the first image request
 
 def clean_text(text):
     text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
@@ -21,67 +21,119 @@ def clean_text(text):
     text = re.sub(r"<.*?>", "", text)
     return text.strip()
 
-def extract_text_from_image(image_bytes):
-    image = Image.open(io.BytesIO(image_bytes))
-    extracted_text = pytesseract.image_to_string(image)
+def open_image(image):
+    """Opens the image straight from its stream (no intermediate copy); PIL images are returned as-is."""
+    from PIL import Image # Python Imaging Library — used to open and manipulate images
+
+    if isinstance(image, Image.Image):
+        return image
+
+    opened = Image.open(as_binary_stream(image))
+    opened.load() # Decode now, so the image no longer depends on the stream's position
+    return opened
+
+@timed("ocr")
+def extract_text_from_image(image):
+    extracted_text = extract_text(open_image(image))
     return clean_text(extracted_text)
 
 def is_meaningful_text(text: str) -> bool:
     return bool(text.strip()) 
 
-def describe_with_google_sdk(image_bytes: bytes) -> str:
-    image = Image.open(io.BytesIO(image_bytes))
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content([
-        "Describe this image. What appliance is it, what model, and what issue might it have? Be specific and technical.",
+@timed("image_vision")
+def describe_with_google_sdk(image) -> str:
+    image = open_image(image)
+    model = get_generative_model(IMAGE_MODEL)
+    response = llm_client.call(lambda timeout: model.generate_content([
+        VISION_PROMPT,
+        image
+    ], request_options={"timeout": timeout}))
+    return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate visual description."
+
+@timed("image_vision")
+async def describe_with_google_sdk_async(image) -> str:
+    model = get_generative_model(IMAGE_MODEL)
+    response = await llm_client.acall(lambda timeout: model.generate_content_async([
+        VISION_PROMPT,
         image
-    ])
+    ], request_options={"timeout": timeout}))
     return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate visual description."
 
-def describe_image(image: str):
-    image_bytes = base64.b64decode(image)
-    ocr_text = extract_text_from_image(image_bytes)
+def get_combined_model():
+    return get_chat_model(
+        IMAGE_MODEL,
+        temperature=0.2,
+        top_k=40,
+        top_p=0.7,
+        max_output_tokens=500
+    )
 
-    if is_meaningful_text(ocr_text):
-        model = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0.2,
-            top_k=40,
-            top_p=0.7,
-            max_output_tokens=500
-        )
-
-        examples = [
-            {
-                "ocr": "HP Pavilion dv6000\nOperating System not found",
-                "desc": "This is an HP Pavilion dv6000 laptop. The screen shows a BIOS error message: 'Operating System not found', which usually indicates a missing bootloader or a failed hard disk."
-            },
-            {
-                "ocr": "LG Washing Machine Model WM3488HW\nError Code: OE",
-                "desc": "This appears to be an LG WM3488HW washing machine. The OE error code points to a drainage issue, likely due to a clogged drain filter or blocked hose."
-            },
-            {
-                "ocr": "Canon PIXMA MG2522\nPaper Jam\nError E03",
-                "desc": "This is a Canon PIXMA MG2522 printer. It shows Error E03 and a 'Paper Jam' message, which means paper is likely stuck inside the feed mechanism or rollers."
-            }
-        ]
-
-        messages = []
-        for ex in examples:
-            messages.append({"role": "user", "content": f"OCR Text:\n{ex['ocr']}"})
-            messages.append({"role": "assistant", "content": ex["desc"]})
+def combined_messages(ocr_text, visual_description):
+    """Few-shot chat messages asking Gemini to combine the OCR text and the visual description."""
+    examples = [
+        {
+            "ocr": "HP Pavilion dv6000\nOperating System not found",
+            "desc": "This is an HP Pavilion dv6000 laptop. The screen shows a BIOS error message: 'Operating System not found', which usually indicates a missing bootloader or a failed hard disk."
+        },
+        {
+            "ocr": "LG Washing Machine Model WM3488HW\nError Code: OE",
+            "desc": "This appears to be an LG WM3488HW washing machine. The OE error code points to a drainage issue, likely due to a clogged drain filter or blocked hose."
+        },
+        {
+            "ocr": "Canon PIXMA MG2522\nPaper Jam\nError E03",
+            "desc": "This is a Canon PIXMA MG2522 printer. It shows Error E03 and a 'Paper Jam' message, which means paper is likely stuck inside the feed mechanism or rollers."
+        }
+    ]
+
+    messages = []
+    for ex in examples:
+        messages.append({"role": "user", "content": f"OCR Text:\n{ex['ocr']}"})
+        messages.append({"role": "assistant", "content": ex["desc"]})
+
+    # Add the combined prompt
+    messages.append({
+        "role": "user",
+        "content": f"OCR Text:\n{ocr_text}\n\nVisual Description:\n{visual_description}\n\n{COMBINED_PROMPT}"
+    })
+    return messages
 
+@timed("image_description")
+@cached_description("image", IMAGE_MODEL, VISION_PROMPT + COMBINED_PROMPT)
+def describe_image(image):
+    """Describes an image given as a file-like object, bytes/memoryview or base64 string."""
+    image = open_image(image) # Decoded once and shared by OCR and the vision call
+    ocr_text = extract_text_from_image(image)
+
+    if is_meaningful_text(ocr_text):
         # Run Gemini Vision
-        visual_description = describe_with_google_sdk(image_bytes)
+        visual_description = describe_with_google_sdk(image)
+
+        messages = combined_messages(ocr_text, visual_description)
+        with span("image_combine"):
+            response = llm_client.call(lambda timeout: get_combined_model().invoke(messages))
+        return clean_text(response.content) if response else "Could not generate description."
+
+    else:
+        return describe_with_google_sdk(image)
+
+@timed("image_description")
+@cached_description("image", IMAGE_MODEL, VISION_PROMPT + COMBINED_PROMPT)
+async def describe_image_async(image):
+    """Async version of describe_image, for the asyncio request path.
+
+    Decoding and OCR are CPU work, so they run off the event loop; the Gemini calls are awaited.
+    """
+    image = await asyncio.to_thread(open_image, image)
+    ocr_text = await asyncio.to_thread(extract_text_from_image, image)
 
-        # Add the combined prompt
-        messages.append({
-            "role": "user",
-            "content": f"OCR Text:\n{ocr_text}\n\nVisual Description:\n{visual_description}\n\nUsing both the OCR and visual info, describe the appliance, its model (if possible), and the issue. Be specific and technical. If uncertain, make an educated guess and explain."
-        })
+    if is_meaningful_text(ocr_text):
+        # Run Gemini Vision
+        visual_description = await describe_with_google_sdk_async(image)
 
-        response = model.invoke(messages)
+        messages = combined_messages(ocr_text, visual_description)
+        with span("image_combine"):
+            response = await llm_client.acall(lambda timeout: get_combined_model().ainvoke(messages))
         return clean_text(response.content) if response else "Could not generate description."
 
     else:
-        return describe_with_google_sdk(image_bytes)
+        return await describe_with_google_sdk_async(image)
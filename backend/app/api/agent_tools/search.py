@@ -1,35 +1,89 @@
 from backend.app.api import *
-from langchain.agents import tool
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.tools import tool
+from backend.app.utils.registry import PERSIST_DIRECTORY, get_vector_store
+from backend.app.utils.lexical_index import LexicalIndex
+from backend.app.utils.metrics import timed
 import os
 
-# Configurations
-current_dir = os.path.dirname(os.path.abspath(__file__))
-persistent_directory = os.path.abspath(os.path.join(current_dir, "..", "..", "..", "data", "vector_database"))
+# Maximum distance for a match to be returned at all
+SCORE_THRESHOLD = 0.6
 
-# Initialize embeddings & vector database
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en")
-vector_db = Chroma(persist_directory=persistent_directory, embedding_function=embeddings)
+# Hybrid retrieval: top-k from each retriever, fused with weighted reciprocal rank fusion
+HYBRID_K = int(os.getenv("HYBRID_K", "5"))
+VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# BM25 index over guide titles and summaries, built next to the Chroma collection
+lexical_index = LexicalIndex(os.path.join(PERSIST_DIRECTORY, "lexical_index.json"))
+
+def fuse_rankings(vector_ranking, lexical_ranking, k=RRF_K):
+    """Weighted reciprocal rank fusion of two best-first lists of filenames."""
+    scores = {}
+    for weight, ranking in ((VECTOR_WEIGHT, vector_ranking), (LEXICAL_WEIGHT, lexical_ranking)):
+        for rank, filename in enumerate(ranking, start=1):
+            scores[filename] = scores.get(filename, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+@timed("search")
+def search_closest_match(query: str):
+    """Returns (metadata, score) of the best match, or (None, None) if nothing is indexed.
+
+    Queries whose model numbers/error codes pin down a single guide are exact hits, chosen over the
+    fused ranking once the vector search confirms the guide is within SCORE_THRESHOLD. Otherwise vector
+    and BM25 results are fused, preferring matches within SCORE_THRESHOLD. The score is always the
+    winner's vector distance, so the router's stricter cut-off still applies to exact hits; a guide only
+    the lexical index found is reported at SCORE_THRESHOLD, so the agent still double-checks it and the
+    router never serves it without the agent.
+    """
+    lexical_index.refresh()
+
+    results = get_vector_store().similarity_search_with_score(query, k=HYBRID_K)  # Get the top matches
+
+    # results will be a list of tuples, each containing a document and its similarity score
+
+    vector_matches = {doc.metadata.get("filename"): (doc, score) for doc, score in results}
+
+    exact = lexical_index.exact_match(query)
+    if exact in vector_matches and vector_matches[exact][1] <= SCORE_THRESHOLD:
+        doc, score = vector_matches[exact]
+        metadata = dict(doc.metadata)
+        metadata["similarity_score"] = score
+        metadata["match_source"] = "exact"
+        return metadata, score
+
+    lexical_matches = lexical_index.search(query, k=HYBRID_K)
+
+    ranking = fuse_rankings(list(vector_matches), [filename for filename, _ in lexical_matches])
+    if not ranking:
+        return None, None
+
+    # Fusion only orders the vector matches that pass SCORE_THRESHOLD, so a lexical favourite with a
+    # poor distance never displaces a passing match; without one, the fused winner stands as before
+    passing = [filename for filename in ranking if filename in vector_matches and vector_matches[filename][1] <= SCORE_THRESHOLD]
+    best = passing[0] if passing else ranking[0]  # Extract top match
+    if best in vector_matches:
+        doc, score = vector_matches[best]
+        metadata = dict(doc.metadata)
+        metadata["match_source"] = "hybrid" if any(filename == best for filename, _ in lexical_matches) else "vector"
+    else:
+        metadata, score = lexical_index.metadata(best), SCORE_THRESHOLD
+        metadata["match_source"] = "lexical"
+
+    metadata["similarity_score"] = score  # Include similarity score in output
+
+    return metadata, score
 
 @tool
 def find_closest_match(query: str):
     """Finds the most relevant document in the vector database based on similarity search and returns its metadata."""
-    results = vector_db.similarity_search_with_score(query, k=1)  # Get the top match
+    metadata, score = search_closest_match(query)
 
-    # results will be a list of tuples, each containing a document and its similarity score
-
-    if not results:
+    if metadata is None:
         return {"error": "No matches found in the vector database."}
-    
-    doc, score = results[0]  # Extract top match - the first tuple in the list
-    
+
     # Enforce score threshold
-    score_threshold = 0.6
-    if score > score_threshold:
+    if score > SCORE_THRESHOLD:
         return "No match passed the similarity score threshold."
-    
-    metadata = doc.metadata
-    metadata["similarity_score"] = score  # Include similarity score in output
 
     return metadata
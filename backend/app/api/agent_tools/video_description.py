@@ -1,21 +1,14 @@
 from backend.app.api import *
-import base64
 import re
-import os
-import time
-from dotenv import load_dotenv
+import asyncio
+from backend.app.utils.registry import get_vertex_model
+from backend.app.utils.media import read_media
+from backend.app.utils.description_cache import cached_description
+from backend.app.utils.llm_client import llm_client
+from backend.app.utils.metrics import timed
 
-from vertexai.generative_models import GenerativeModel, Part
-import vertexai
-from google.oauth2 import service_account
-
-load_dotenv()
-PROJECT_ID = os.getenv("PROJECT_ID")  # Set this in your .env
-LOCATION = "us-central1"
-SERVICE_ACCOUNT_PATH = os.getenv("SERVICE_ACCOUNT_JSON")  
-
-credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_PATH)
-vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
+VIDEO_MODEL = "gemini-1.5-pro"
+VIDEO_PROMPT = "Describe this video in detail. Include visual content, actions, objects, and transcribe the audio if present. Try to identify any appliances, devices, or repair scenarios shown."
 
 def clean_text(text):
     """Cleans LLM-generated text while preserving actual content."""
@@ -26,27 +19,38 @@ def clean_text(text):
     text = re.sub(r"<.*?>", "", text)
     return text.strip()
 
-def describe_video(video: str):
-    """Takes base64-encoded video (e.g. .mp4), uploads it via Vertex AI Part, and returns a detailed description."""
+def video_content(video):
+    from vertexai.generative_models import Part
 
-    video_bytes = base64.b64decode(video)
+    video_bytes = read_media(video)  # The SDK only takes inline bytes, so this is the single in-memory copy
 
-    # Write the decoded bytes to a temporary file
-    temp_path = "temp_video.mp4"
-    with open(temp_path, "wb") as f:
-        f.write(video_bytes)
+    video_part = Part.from_data(data=video_bytes, mime_type="video/mp4")
+    return [video_part, VIDEO_PROMPT]
 
-    model = GenerativeModel("gemini-1.5-pro")
+@timed("video_description")
+@cached_description("video", VIDEO_MODEL, VIDEO_PROMPT)
+def describe_video(video):
+    """Takes a video (e.g. .mp4) as a file-like object, bytes/memoryview or base64 string, uploads it via Vertex AI Part, and returns a detailed description."""
 
-    video_part = Part.from_data(data=video_bytes, mime_type="video/mp4")
+    model = get_vertex_model(VIDEO_MODEL)
+
+    try:
+        content = video_content(video)
+        response = llm_client.call(lambda timeout: model.generate_content(content))  # Vertex takes no per-call timeout; the deadline bounds retries
+        return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate description."
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+@timed("video_description")
+@cached_description("video", VIDEO_MODEL, VIDEO_PROMPT)
+async def describe_video_async(video):
+    """Async version of describe_video, for the asyncio request path."""
 
-    prompt = "Describe this video in detail. Include visual content, actions, objects, and transcribe the audio if present. Try to identify any appliances, devices, or repair scenarios shown."
+    model = get_vertex_model(VIDEO_MODEL)
 
     try:
-        response = model.generate_content([video_part, prompt])
+        content = await asyncio.to_thread(video_content, video)  # Reads the whole upload, so off the event loop
+        response = await llm_client.acall(lambda timeout: model.generate_content_async(content))
         return clean_text(response.text) if response and hasattr(response, "text") else "Could not generate description."
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
@@ -0,0 +1,39 @@
+from flask import Response
+from flask_restful import Resource
+from . import *
+
+from backend.app.api.agent import response_cache
+from backend.app.api.agent_tools import history_store
+from backend.app.api.vectordb_generator import summary_cache
+from backend.app.utils import prompt_compaction
+from backend.app.utils.description_cache import description_cache
+from backend.app.utils.llm_client import llm_client, index_llm_client
+from backend.app.utils.metrics import register_stats, render
+from backend.app.utils.registry import loaded_cached_embeddings
+
+# Counters kept by the caches and the LLM client, read on every scrape
+register_stats("llm", llm_client.stats)
+register_stats("index_llm", index_llm_client.stats)
+register_stats("response_cache", response_cache.stats)
+register_stats("description_cache", description_cache.stats)
+register_stats("summary_cache", summary_cache.stats)
+register_stats("chat_history_cache", history_store.stats)
+register_stats("prompt_compaction", prompt_compaction.stats, label="purpose")
+
+
+def embedding_cache_stats():
+    """Reported once something has loaded the embedding model; a scrape never loads it."""
+    embeddings = loaded_cached_embeddings()
+    return embeddings.stats() if embeddings else {}
+
+
+register_stats("embedding_cache", embedding_cache_stats)
+
+
+class Metrics(Resource):
+    def get(self):
+        """Stage latencies, error counts, LLM calls and cache hit rates in the Prometheus text format."""
+        return Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+api.add_resource(Metrics, "/metrics")
@@ -0,0 +1,94 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from flask_restful import Resource
+from dotenv import load_dotenv
+
+from . import *
+from backend.app.api.agent_tools import search_closest_match
+
+load_dotenv()
+
+# Distance at or below which the top vector match is served directly, without the ReAct agent.
+# Stricter than the tool's 0.6 cut-off, since no LLM double-checks the match on this path.
+CONFIDENT_MATCH_THRESHOLD = float(os.getenv("ROUTER_CONFIDENT_DISTANCE", "0.35"))
+
+# LLM round-trips the agent spends on a plain match: one to decide on find_closest_match, one to answer
+AGENT_LLM_CALLS_PER_MATCH = 2
+
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(again|still|previous(ly)?|earlier|last time|you (said|mentioned|suggested)|same (one|problem|issue)|"
+    r"what about|next step|step \d+|above|didn'?t (work|help)|that (one|step|part)|it (still|now))\b",
+    re.IGNORECASE
+)
+GREETING_PATTERN = re.compile(r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))\b[\s!.?]*$", re.IGNORECASE)
+
+ROUTE_FAST_PATH = "fast_path"
+ROUTE_FOLLOW_UP = "agent_follow_up"
+ROUTE_LOW_CONFIDENCE = "agent_low_confidence"
+ROUTE_CONVERSATIONAL = "agent_conversational"
+
+
+class RouteStats:
+    """Thread-safe per-route request counters."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, route):
+        with self.lock:
+            self.counts[route] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        fast_path = counts.get(ROUTE_FAST_PATH, 0)
+        return {
+            "routes": counts,
+            "total_requests": total,
+            "fast_path_rate": fast_path / total if total else 0.0,
+            "agent_llm_calls_saved": fast_path * AGENT_LLM_CALLS_PER_MATCH
+        }
+
+
+route_stats = RouteStats()
+
+
+def is_follow_up(query):
+    return bool(FOLLOW_UP_PATTERN.search(query))
+
+
+def route_query(query, media_descriptions=(), has_history=False):
+    """Decides whether a request can skip the ReAct agent.
+
+    Returns (route, matched guide metadata). The metadata is only set on the fast path, i.e. for
+    a fresh query whose top vector match is within CONFIDENT_MATCH_THRESHOLD. Follow-ups (any query
+    in a session with earlier turns, or one that reads like a follow-up), greetings and
+    low-confidence matches go to the agent.
+    """
+    if has_history or is_follow_up(query):
+        route, metadata = ROUTE_FOLLOW_UP, None
+    elif (not query.strip() and not media_descriptions) or GREETING_PATTERN.match(query):
+        route, metadata = ROUTE_CONVERSATIONAL, None
+    else:
+        search_text = "\n".join(part for part in (query, *media_descriptions) if part)
+        metadata, score = search_closest_match(search_text)
+        if metadata is not None and score <= CONFIDENT_MATCH_THRESHOLD:
+            route = ROUTE_FAST_PATH
+        else:
+            route, metadata = ROUTE_LOW_CONFIDENCE, None
+
+    route_stats.record(route)
+    return route, metadata
+
+
+class AgentRoutes(Resource):
+    def get(self):
+        return route_stats.snapshot(), 200
+
+
+api.add_resource(AgentRoutes, "/agent_routes")
@@ -3,16 +3,25 @@ import traceback
 import json
 import re
 import time 
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from . import *
-from flask import current_app as app
+from flask import request, current_app as app
 from flask_restful import Resource
 from dotenv import load_dotenv
+from filelock import FileLock, Timeout
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import HuggingFaceHub
+from backend.app.utils.rate_limiter import RateLimiter
+from backend.app.utils.llm_client import CircuitOpen, index_llm_client
+from backend.app.utils.index_manifest import IndexManifest, hash_bytes
+from backend.app.utils.summary_cache import SummaryCache
+from backend.app.utils.metrics import span
+from backend.app.utils.prompt_compaction import SUMMARY_INPUT_TOKENS, compact_guide, stats as compaction_stats
+from backend.app.utils.lexical_index import LexicalIndex
+from backend.app.utils.index_jobs import IndexJobStore, JobProgress, JobCancelled, BuildInProgress, RESUMABLE_STATUSES
+from backend.app.utils.registry import PERSIST_DIRECTORY, get_chat_model, get_vector_store
+from backend.app.utils.finalizer import extract_final_data, render_final_answer, rebuild_guide_store, answer_store, guide_store, RENDER_FAILED
 
 # Load environment variables
 load_dotenv()
@@ -20,13 +29,47 @@ load_dotenv()
 # Configurations
 current_dir = os.path.dirname(os.path.abspath(__file__))
 json_dir = os.path.abspath(os.path.join(current_dir, "..", "..", "data", "clean_data"))
-persistent_directory = os.path.abspath(os.path.join(current_dir, "..", "..", "data", "vector_database"))
+persistent_directory = PERSIST_DIRECTORY
+manifest_path = os.path.join(persistent_directory, "index_manifest.json")
+lexical_index_path = os.path.join(persistent_directory, "lexical_index.json")
 
-# Initialize embeddings & vector database
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en")
+# Held for the whole build, so two builds (in any process) never write to the same persist directory
+build_lock_path = os.path.join(persistent_directory, ".build.lock")
+
+# Background build jobs, see VectorDBJobs
+jobs = IndexJobStore(os.getenv("INDEX_JOBS_DIR", os.path.abspath(os.path.join(current_dir, "..", "..", "data", "index_jobs"))))
+
+# Near-duplicate clusters written by data/preprocessing/deduplicate.py; only canonical guides are indexed
+duplicate_clusters_path = os.getenv("DUPLICATE_CLUSTERS_PATH", os.path.abspath(os.path.join(current_dir, "..", "..", "data", "duplicate_clusters.json")))
+
+# Concurrency settings for summary generation (overridable per request via query params)
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_REQUESTS_PER_MINUTE = int(os.getenv("SUMMARY_REQUESTS_PER_MINUTE", "60"))
+
+# Whether final answers are rendered and stored at index time (overridable via ?render_answers=false)
+RENDER_ANSWERS = os.getenv("RENDER_ANSWERS_AT_INDEX", "true").lower() == "true"
+
+# Number of guides summarized, embedded and upserted together before each checkpoint
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
 
 # Initialize Gemini model
-llm_general = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+SUMMARY_MODEL = "gemini-1.5-flash"
+
+SUMMARY_PROMPT = (
+    "Generate a concise repair guide summary. Include: "
+    "- Appliance type\n"
+    "- Model names\n"
+    "- Repair title\n"
+    "- Key steps\n"
+    "- Critical components\n\n"
+    "Guide content:\n"
+)
+
+# Summaries outlive the vector DB, so re-indexes after a crash or a store/embedding change reuse them
+summary_cache = SummaryCache(
+    os.getenv("SUMMARY_CACHE_PATH", os.path.abspath(os.path.join(current_dir, "..", "..", "data", "summary_cache", "summaries.sqlite3"))),
+    max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_MB", "512")) * 1024 * 1024
+)
 
 #llm_general = HuggingFaceHub(repo_id="meta-llama/Llama-3-8B-Instruct")
 
@@ -59,100 +102,439 @@ def extract_title(data):
     return title.strip() if title else ""
 
 
-def generate_gemini_summary(text, delay=2):
-    """Generate structured context using Gemini 2.0 Flash with infinite retries and attempt logging."""
-    attempt = 1  # Track attempt count
+def load_duplicate_clusters(json_files):
+    """Returns ({canonical: aliases string}, set of duplicate filenames) from the cluster map.
+
+    Clusters whose canonical guide is no longer in clean_data are ignored, so their members are
+    indexed on their own until deduplicate.py is re-run.
+    """
+    try:
+        with open(duplicate_clusters_path, "r", encoding="utf-8") as f:
+            clusters = json.load(f).get("clusters", {})
+    except FileNotFoundError:
+        return {}, set()
+
+    present = set(json_files)
+    canonicals = {canonical for canonical in clusters if canonical in present}
+    aliases, duplicates = {}, set()
+    for canonical in canonicals:
+        cluster = clusters[canonical]
+        duplicates.update(cluster.get("duplicates", []))
+        if cluster.get("aliases"):
+            aliases[canonical] = "; ".join(cluster["aliases"])  # Chroma metadata values must be scalars
+    return aliases, duplicates - canonicals
+
+
+def request_summary(text):
+    response = get_chat_model(SUMMARY_MODEL).invoke(f"{SUMMARY_PROMPT}{text}")
+    # An empty or blocked response is an answer, not an outage: it's neither retried nor counted by the breaker
+    return response.content if response and response.content else ""
+
+
+def generate_gemini_summary(text, limiter=None):
+    """Generate structured context using Gemini, with the build's own LLM client (backoff, deadline, circuit breaker).
+
+    Summaries are served from the persistent summary cache when the same guide content was
+    already summarized with the same prompt and model. Returns None if no summary could be generated,
+    so the build skips the guide and the next run retries it. Raises CircuitOpen while the API keeps
+    failing; the build then stops at that batch and a re-run resumes from the last committed one.
+    """
+    cached_summary = summary_cache.get(text, SUMMARY_PROMPT, SUMMARY_MODEL)
+    if cached_summary is not None:
+        return cached_summary
+
+    try:
+        # Only real API calls count against the build's requests-per-minute budget
+        summary = clean_text(index_llm_client.call(lambda timeout: request_summary(text), limiter=limiter))
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        app.logger.error(f"Summary generation failed: {e}")
+        return None
+    if not summary:
+        app.logger.error("Summary generation returned an empty or blocked response")
+        return None
+
+    summary_cache.put(text, SUMMARY_PROMPT, SUMMARY_MODEL, summary)
+    return summary
+
+
+def chroma_id_for(filename):
+    """Stable Chroma document id for a guide file."""
+    return hash_bytes(filename)[:32]
+
+
+def map_in_app_context(function, items, executor=None):
+    """Applies function to items, fanned out over the executor if given, in the same order as the items."""
+    flask_app = app._get_current_object()  # Worker threads need their own app context for logging
+
+    def run(item):
+        with flask_app.app_context():
+            return function(item)
+
+    if executor is None:
+        return [run(item) for item in items]
+
+    return list(executor.map(run, items))  # map() preserves input order
+
+
+def generate_summaries(texts, executor=None, limiter=None):
+    """Generates summaries, fanned out over the executor if given, in the same order as the input texts."""
+    return map_in_app_context(lambda text: generate_gemini_summary(text, limiter=limiter), texts, executor)
+
+
+def render_answer(filename, limiter=None):
+    """Renders the user-facing answer for a guide, or returns None if it couldn't be rendered."""
+    final_data = extract_final_data({"filename": filename})
+    if "error" in final_data:
+        app.logger.error(f"Skipping answer rendering for {filename}: {final_data['error']}")
+        return None
+
+    try:
+        if limiter:
+            limiter.acquire()
+        answer = render_final_answer(final_data, client=index_llm_client)
+    except Exception as e:
+        app.logger.error(f"Answer rendering failed for {filename}: {e}")
+        return None
+    return None if answer == RENDER_FAILED else answer
+
+
+def iter_batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def load_guide(file, aliases=None):
+    """Loads a cleaned guide and returns (summary input text, metadata), or None if the file is invalid.
+
+    aliases are the titles of near-duplicate guides this one stands in for.
+    """
+    file_path = os.path.join(json_dir, file)
+    app.logger.info(f"Processing file: {file_path}")
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        app.logger.info(f"Successfully loaded JSON file: {file_path}")
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        app.logger.error(f"Skipping invalid JSON file: {file} due to error: {e}")
+        return None
+
+    # Extract filename and title
+    filename = os.path.basename(file_path)
+    title = extract_title(data)
+    app.logger.info(f"Extracted title: '{title}' from file: {filename}")
+
+    metadata = {"filename": filename, "title": title}
+    if aliases:
+        metadata["aliases"] = aliases
+    # Compact JSON without media, links or embed markup, fitted to the summary input budget
+    return compact_guide(data, SUMMARY_INPUT_TOKENS, "summary", drop_media=True), metadata
+
+
+def build_vector_db(concurrency=SUMMARY_CONCURRENCY, requests_per_minute=SUMMARY_REQUESTS_PER_MINUTE,
+                    batch_size=EMBEDDING_BATCH_SIZE, full_rebuild=False, render_answers=RENDER_ANSWERS, progress=None):
+    """Runs update_vector_db while holding the persist directory's build lock.
+
+    Raises BuildInProgress if another build, in this or any other process, holds the lock.
+    """
+    os.makedirs(persistent_directory, exist_ok=True)
+    build_lock = FileLock(build_lock_path)
+    try:
+        build_lock.acquire(timeout=0)
+    except Timeout:
+        raise BuildInProgress(f"Another build is already writing to {persistent_directory}")
+
+    try:
+        with span("build"):
+            return update_vector_db(concurrency, requests_per_minute, batch_size, full_rebuild, render_answers, progress)
+    finally:
+        build_lock.release()
+
+
+def update_vector_db(concurrency, requests_per_minute, batch_size, full_rebuild, render_answers, progress=None):
+    """Incrementally brings the vector DB in line with clean_data.
+
+    Changed guides are streamed through summarize -> embed -> upsert one batch at a time, and the
+    manifest is saved after every committed batch. Only one batch is held in memory, and an
+    interrupted build resumes from the last committed batch on the next run.
 
-    while True:  # Keep retrying indefinitely
+    With render_answers, the final user-facing answer of every indexed guide whose source changed
+    since it was last rendered is rendered and stored too, so matches are served without an LLM call.
+
+    progress(stage, processed, total) is called at the start of each stage and after every batch;
+    it may raise (e.g. JobCancelled) to stop the build at that checkpoint.
+    """
+    progress = progress or (lambda stage, processed, total: None)
+
+    if not os.path.exists(json_dir):
+        app.logger.error(f"JSON directory {json_dir} not found")
+        raise FileNotFoundError(f"JSON directory {json_dir} not found")
+
+    json_files = sorted(f for f in os.listdir(json_dir) if f.endswith(".json"))
+    app.logger.info(f"Found {len(json_files)} JSON files in directory {json_dir}")
+
+    # Near-duplicates are summarized and embedded once, through their cluster's canonical guide
+    aliases, duplicates = load_duplicate_clusters(json_files)
+    json_files = [f for f in json_files if f not in duplicates]
+    if duplicates:
+        app.logger.info(f"Skipping {len(duplicates)} near-duplicate guides covered by {len(aliases)} canonical guides")
+
+    # Hash raw file contents to find what changed since the last committed batch
+    content_hashes = {}
+    with span("build_hash"):
+        for file in json_files:
+            with open(os.path.join(json_dir, file), "rb") as f:
+                content_hashes[file] = hash_bytes(f.read())
+
+    manifest = IndexManifest(manifest_path)
+    lexical_index = LexicalIndex(lexical_index_path).load()
+    vector_db = get_vector_store(persistent_directory)
+
+    if full_rebuild or not manifest.exists:
+        # Without a manifest the collection's ids are unknown, so start from a clean collection
+        app.logger.info("Resetting vector DB collection for a full rebuild")
+        vector_db.reset_collection()
+        manifest.entries = {}
+        manifest.save()
+        lexical_index.entries = {}
+        lexical_index.save()
+
+    changed, removed = manifest.diff(content_hashes)
+
+    # Guides indexed before the lexical index existed, or whose aliases changed, are re-run too;
+    # their summaries come from the cache
+    changed += [name for name in manifest.entries
+                if name not in removed and name not in changed
+                and (name not in lexical_index.entries or lexical_index.metadata(name).get("aliases") != aliases.get(name))]
+    app.logger.info(f"{len(changed)} new or changed files, {len(removed)} removed files, "
+                    f"{len(json_files) - len(changed)} unchanged files")
+
+    # Delete entries whose source files were removed
+    if removed:
+        vector_db.delete(ids=[manifest.entries[name]["chroma_id"] for name in removed])
+        for name in removed:
+            manifest.remove(name)
+            lexical_index.remove(name)
+        manifest.save()
+        lexical_index.save()
+        app.logger.info(f"Deleted {len(removed)} entries for removed files")
+
+    # Refresh the guide store first, so answer rendering below reads from the current corpus
+    if changed or removed or not os.path.exists(guide_store.path):
+        with span("build_guide_store"):
+            app.logger.info(f"Guide store rebuilt with {rebuild_guide_store()} guides")
+
+    limiter = RateLimiter(requests_per_minute)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="summary") if concurrency > 1 else None
+    added = 0
+    failed = 0
+    processed = 0
+
+    try:
+        progress("indexing", 0, len(changed))
+        for batch_number, batch in enumerate(iter_batches(changed, batch_size), start=1):
+            with span("build_load"):
+                entries = [entry for entry in (load_guide(file, aliases.get(file)) for file in batch) if entry]
+            processed += len(batch)
+            if not entries:
+                progress("indexing", processed, len(changed))
+                continue
+
+            # Generate summaries concurrently, within the requests-per-minute budget
+            with span("build_summaries"):
+                summaries = generate_summaries([entry[0] for entry in entries], executor, limiter)
+
+            # Guides without a summary stay out of the manifest, so the next build retries them
+            skipped = [entry[1]["filename"] for entry, summary in zip(entries, summaries) if summary is None]
+            if skipped:
+                app.logger.error(f"No summary for {len(skipped)} guides, left for the next build: {', '.join(skipped)}")
+                failed += len(skipped)
+                kept = [(entry, summary) for entry, summary in zip(entries, summaries) if summary is not None]
+                entries = [entry for entry, _ in kept]
+                summaries = [summary for _, summary in kept]
+                if not entries:
+                    progress("indexing", processed, len(changed))
+                    continue
+            metadatas = [entry[1] for entry in entries]
+            ids = [chroma_id_for(metadata["filename"]) for metadata in metadatas]
+
+            # Embed and upsert this batch under stable ids, so re-indexing replaces instead of duplicating.
+            # Aliases are embedded with the summary, so sibling models' names match the canonical guide
+            texts = [f"{summary}\nAlso covers: {metadata['aliases']}" if metadata.get("aliases") else summary
+                     for summary, metadata in zip(summaries, metadatas)]
+            with span("build_embed_upsert"):
+                vector_db.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+
+            # Checkpoint: the batch is committed once the manifest records it
+            for summary, metadata, chroma_id in zip(summaries, metadatas, ids):
+                filename = metadata["filename"]
+                manifest.update(filename, content_hashes[filename], summary, chroma_id)
+                lexical_index.update(filename, metadata, f"{metadata['title']}\n{metadata.get('aliases', '')}\n{summary}")
+            manifest.save()
+            lexical_index.save()
+
+            added += len(entries)
+            app.logger.info(f"Committed batch {batch_number}: {added}/{len(changed)} changed files indexed")
+            progress("indexing", processed, len(changed))
+
+        rendered = 0
+        if render_answers:
+            # Drop answers of removed guides, then (re-)render those whose source JSON changed
+            rendered_hashes = answer_store.content_hashes()
+            answer_store.delete([name for name in rendered_hashes if name not in manifest.entries])
+            stale = [name for name, entry in manifest.entries.items()
+                     if rendered_hashes.get(name) != entry["content_hash"]]
+            app.logger.info(f"Rendering final answers for {len(stale)} guides")
+
+            processed = 0
+            progress("rendering", 0, len(stale))
+            for batch in iter_batches(sorted(stale), batch_size):
+                with span("build_render"):
+                    answers = map_in_app_context(lambda name: render_answer(name, limiter), batch, executor)
+                for name, answer in zip(batch, answers):
+                    if answer is not None:
+                        answer_store.put(name, os.path.join(json_dir, name), manifest.entries[name]["content_hash"], answer)
+                        rendered += 1
+                processed += len(batch)
+                progress("rendering", processed, len(stale))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return {
+        "files_added": added,
+        "files_failed": failed,
+        "files_removed": len(removed),
+        "files_unchanged": len(json_files) - len(changed),
+        "duplicates_skipped": len(duplicates),
+        "answers_rendered": rendered,
+        "total_entries": len(manifest.entries)
+    }
+
+
+def build_params(args):
+    """build_vector_db keyword arguments from the request's query parameters."""
+    return {
+        "concurrency": args.get("concurrency", SUMMARY_CONCURRENCY, type=int),
+        "requests_per_minute": args.get("rpm", SUMMARY_REQUESTS_PER_MINUTE, type=int),
+        "batch_size": max(1, args.get("batch_size", EMBEDDING_BATCH_SIZE, type=int)),
+        "full_rebuild": args.get("full", "false").lower() == "true",
+        "render_answers": args.get("render_answers", str(RENDER_ANSWERS)).lower() == "true"
+    }
+
+
+def run_job(flask_app, job_id):
+    """Runs a build job to completion, cancellation or failure, recording the outcome in the job store.
+
+    The job must be claimed by this process (jobs.create / jobs.claim); the claim is released once
+    the outcome is recorded.
+    """
+    with flask_app.app_context():
         try:
-            response = llm_general.invoke(
-                "Generate a concise repair guide summary. Include: "
-                "- Appliance type\n"
-                "- Model names\n"
-                "- Repair title\n"
-                "- Key steps\n"
-                "- Critical components\n\n"
-                f"Guide content:\n{text}"
-            )
-            if response and response.content:
-                app.logger.info(f"Success on attempt {attempt}")
-                return clean_text(response.content)
-            
-            app.logger.warning(f"Attempt {attempt}: Empty response received, retrying...")
+            job = jobs.update(job_id, status="running", started_at=time.time(), finished_at=None, error=None, pid=os.getpid())
+            result = build_vector_db(**job["params"], progress=JobProgress(jobs, job_id))
+            jobs.update(job_id, status="completed", result=result, finished_at=time.time())
+            app.logger.info(f"Index job {job_id} completed: {result}")
+        except JobCancelled:
+            jobs.update(job_id, status="cancelled", finished_at=time.time())
+            app.logger.info(f"Index job {job_id} cancelled")
         except Exception as e:
-            app.logger.error(f"Gemini API Error (Attempt {attempt}): {e}")
+            jobs.update(job_id, status="failed", error=str(e), finished_at=time.time())
+            app.logger.error(f"Index job {job_id} failed: {e}")
+            app.logger.error(traceback.format_exc())
+        finally:
+            jobs.release(job_id)
+
 
-        attempt += 1  # Increment attempt counter
-        time.sleep(delay)  # Wait before retrying
+def start_job(job_id):
+    flask_app = app._get_current_object()  # The job thread needs its own app context for logging
+    threading.Thread(target=run_job, args=(flask_app, job_id), name=f"index-job-{job_id[:8]}", daemon=True).start()
 
 
 class GenerateVectorDB(Resource):
     def get(self):
         try:
             app.logger.info("Starting vector DB generation process")
-            if not os.path.exists(json_dir):
-                app.logger.error(f"JSON directory {json_dir} not found")
-                raise FileNotFoundError(f"JSON directory {json_dir} not found")
-
-            json_files = [f for f in os.listdir(json_dir) if f.endswith(".json")]
-            app.logger.info(f"Found {len(json_files)} JSON files in directory {json_dir}")
-            documents = []
-            count = 0
-
-            for file in json_files:
-                file_path = os.path.join(json_dir, file)
-                app.logger.info(f"Processing file: {file_path}")
-                
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    app.logger.info(f"Successfully loaded JSON file: {file_path}")
-                except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                    app.logger.error(f"Skipping invalid JSON file: {file} due to error: {e}")
-                    continue
+            result = build_vector_db(**build_params(request.args))
 
-                # Extract filename and title
-                filename = os.path.basename(file_path)
-                title = extract_title(data)
-                app.logger.info(f"Extracted title: '{title}' from file: {filename}")
-                
-                # Generate summary
-                json_text = json.dumps(data, indent=2)
-                summary = generate_gemini_summary(json_text)
-                app.logger.info(f"Generated summary for file: {filename}")
-                
-                # Create document with metadata
-                metadata = {"filename": filename, "title": title}
-                documents.append((summary, metadata))
-                count += 1
-
-            app.logger.info(f"Processed {count} JSON files with {len(documents)} valid entries")
-
-            if not documents:
+            if not result["total_entries"]:
                 app.logger.warning("No valid documents found for vectorization")
                 return {"error": "No valid documents found for vectorization"}, 400
 
-            # Split into texts and metadata
-            texts = [doc[0] for doc in documents]
-            metadatas = [doc[1] for doc in documents]
-
-            # Create and persist vector store
-            Chroma.from_texts(
-                texts=texts,
-                embedding=embeddings,
-                metadatas=metadatas,
-                persist_directory=persistent_directory
-            )
-            app.logger.info(f"Vector DB created successfully with {len(texts)} entries at {persistent_directory}")
+            app.logger.info(f"Vector DB updated with {result['files_added']} entries at {persistent_directory}")
             return {
-                "message": f"Vector DB created successfully with {len(texts)} entries",
+                "message": f"Vector DB updated successfully with {result['files_added']} entries",
                 "persist_dir": persistent_directory,
-                "files_added": len(texts)
+                **result,
+                "summary_cache": summary_cache.stats(),
+                "prompt_compaction": compaction_stats()
             }, 200
 
+        except BuildInProgress as e:
+            return {"error": str(e)}, 409
         except Exception as e:
             app.logger.error(f"Vector DB creation failed: {str(e)}")
             app.logger.error(traceback.format_exc())
             return {"error": "Vector DB creation failed - check server logs"}, 500
 
-api.add_resource(GenerateVectorDB, "/generate_vectordb")
\ No newline at end of file
+
+class VectorDBJobs(Resource):
+    def post(self):
+        """Submits a background build with the same query parameters as GET /generate_vectordb."""
+        active = jobs.active()
+        if active:
+            return {"error": "An index build is already queued or running", "job_id": active["id"]}, 409
+
+        job = jobs.create(build_params(request.args))
+        start_job(job["id"])
+        app.logger.info(f"Submitted index job {job['id']}")
+        return {"job_id": job["id"], "status_url": f"/generate_vectordb/jobs/{job['id']}"}, 202
+
+    def get(self):
+        return {"jobs": jobs.list()}, 200
+
+
+class VectorDBJob(Resource):
+    def get(self, job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return {"error": "Job not found"}, 404
+        return job, 200
+
+    def delete(self, job_id):
+        """Cancels the job; it stops at its next checkpoint, keeping every batch committed so far."""
+        job = jobs.get(job_id)
+        if job is None:
+            return {"error": "Job not found"}, 404
+        if job["status"] not in ("queued", "running"):
+            return {"error": f"Job is {job['status']}"}, 409
+        return jobs.update(job_id, status="cancelling"), 202
+
+
+class VectorDBJobResume(Resource):
+    def post(self, job_id):
+        """Restarts an interrupted, failed or cancelled job; it picks up after the last committed batch."""
+        job = jobs.get(job_id)
+        if job is None:
+            return {"error": "Job not found"}, 404
+        if job["status"] not in RESUMABLE_STATUSES:
+            return {"error": f"Job is {job['status']}"}, 409
+        active = jobs.active()
+        if active:
+            return {"error": "An index build is already queued or running", "job_id": active["id"]}, 409
+
+        try:
+            jobs.claim(job_id)
+        except Timeout:
+            return {"error": "Job is already being resumed"}, 409
+        jobs.update(job_id, status="queued", resumes=job["resumes"] + 1, pid=os.getpid())
+        start_job(job_id)
+        app.logger.info(f"Resumed index job {job_id}")
+        return {"job_id": job_id, "status_url": f"/generate_vectordb/jobs/{job_id}"}, 202
+
+api.add_resource(GenerateVectorDB, "/generate_vectordb")
+api.add_resource(VectorDBJobs, "/generate_vectordb/jobs")
+api.add_resource(VectorDBJob, "/generate_vectordb/jobs/<string:job_id>")
+api.add_resource(VectorDBJobResume, "/generate_vectordb/jobs/<string:job_id>/resume")
\ No newline at end of file
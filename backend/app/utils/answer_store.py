@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import time
+
+from backend.app.utils.index_manifest import hash_bytes
+
+
+class AnswerStore:
+    """SQLite store of user-facing answers rendered for each guide at index time.
+
+    Each answer records the content hash and the file signature (mtime, size) of the guide it was
+    rendered from. Lookups stat the guide file and ignore answers whose source content has changed
+    since, so a stale answer is never served, even before the next index run re-renders it. A matching
+    signature is the fast path; otherwise the file is re-hashed, so a touch or a copy that keeps the
+    content doesn't hide the answer (the next index run wouldn't re-render it).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    @property
+    def connection(self):
+        """This process's connection, opened on first use (under self.lock).
+
+        The store is created at import time, which a pre-fork server runs in its master; SQLite
+        connections must not be carried across a fork, so each worker opens its own.
+        """
+        if self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "filename TEXT PRIMARY KEY, content_hash TEXT NOT NULL, source_signature TEXT NOT NULL, "
+                "answer TEXT NOT NULL, rendered_at REAL NOT NULL)"
+            )
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    @staticmethod
+    def file_signature(file_path):
+        stat = os.stat(file_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def get(self, filename, file_path):
+        """Returns the rendered answer for the guide, or None if there is none or it is stale."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT answer, content_hash, source_signature FROM answers WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is None:
+            return None
+        answer, content_hash, source_signature = row
+
+        try:
+            signature = self.file_signature(file_path)
+            if signature == source_signature:
+                return answer
+            with open(file_path, "rb") as f:
+                if hash_bytes(f.read()) != content_hash:
+                    return None
+        except FileNotFoundError:
+            return None
+
+        with self.lock:  # Same content under a new signature; take the fast path next time
+            self.connection.execute(
+                "UPDATE answers SET source_signature = ? WHERE filename = ? AND content_hash = ?",
+                (signature, filename, content_hash)
+            )
+            self.connection.commit()
+        return answer
+
+    def content_hashes(self):
+        """Returns {filename: content hash the stored answer was rendered from}."""
+        with self.lock:
+            return dict(self.connection.execute("SELECT filename, content_hash FROM answers").fetchall())
+
+    def put(self, filename, file_path, content_hash, answer):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers (filename, content_hash, source_signature, answer, rendered_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (filename, content_hash, self.file_signature(file_path), answer, time.time())
+            )
+            self.connection.commit()
+
+    def delete(self, filenames):
+        with self.lock:
+            self.connection.executemany("DELETE FROM answers WHERE filename = ?", [(name,) for name in filenames])
+            self.connection.commit()
@@ -0,0 +1,259 @@
+"""Bounded chat-history access.
+
+Messages are stored one Firestore document per message under
+{collection}/{session_id}/messages, so the last N messages are a single ordered, limited query
+instead of loading the whole session. Recent turns are cached per session in-process, and each
+user+AI turn is written as one batched commit in the background. Every commit also bumps a version
+counter on the session document, which cached tails are checked against before they're served, so
+a worker never answers from a tail that's missing a turn another worker just wrote.
+
+For tests, use InMemoryHistoryBackend, or point FirestoreHistoryBackend at the Firestore emulator
+by setting FIRESTORE_EMULATOR_HOST (the Firestore client picks it up automatically).
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+VERSION_FIELD = "history_version"
+
+
+class FirestoreHistoryBackend:
+    def __init__(self, client_factory, collection, async_client_factory=None):
+        self.client_factory = client_factory  # Called lazily, so importing doesn't create a client
+        self.async_client_factory = async_client_factory
+        self.collection = collection
+
+    def _session(self, session_id, client=None):
+        client = client or self.client_factory()
+        return client.collection(self.collection).document(str(session_id))
+
+    def _messages(self, session_id, client=None):
+        return self._session(session_id, client).collection("messages")
+
+    def version(self, session_id):
+        """The session's write counter; only that field is read, not a legacy session's messages."""
+        snapshot = self._session(session_id).get(field_paths=[VERSION_FIELD])
+        return (snapshot.to_dict() or {}).get(VERSION_FIELD, 0)
+
+    async def aversion(self, session_id):
+        if self.async_client_factory is None:
+            return await asyncio.to_thread(self.version, session_id)
+        snapshot = await self._session(session_id, self.async_client_factory()).get(field_paths=[VERSION_FIELD])
+        return (snapshot.to_dict() or {}).get(VERSION_FIELD, 0)
+
+    def _tail_query(self, messages, limit):
+        from google.cloud import firestore
+        return messages.order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit)
+
+    def tail(self, session_id, limit):
+        """Returns the last `limit` messages of the session, oldest first."""
+        query = self._tail_query(self._messages(session_id), limit)
+        messages = [{"type": doc.get("type"), "content": doc.get("content")} for doc in query.stream()][::-1]
+        if len(messages) < limit:
+            # Sessions started before the per-message layout keep their older messages in the session document
+            messages = self._legacy_tail(session_id, limit - len(messages)) + messages
+        return messages
+
+    async def atail(self, session_id, limit):
+        """Async version of tail(), using the AsyncClient when one is configured."""
+        if self.async_client_factory is None:
+            return await asyncio.to_thread(self.tail, session_id, limit)
+
+        query = self._tail_query(self._messages(session_id, self.async_client_factory()), limit)
+        messages = [{"type": doc.get("type"), "content": doc.get("content")} async for doc in query.stream()][::-1]
+        if len(messages) < limit:
+            messages = await asyncio.to_thread(self._legacy_tail, session_id, limit - len(messages)) + messages
+        return messages
+
+    def _legacy_tail(self, session_id, limit):
+        """Sessions written before the per-message layout keep all messages in the session document."""
+        from langchain_google_firestore import FirestoreChatMessageHistory
+
+        legacy = FirestoreChatMessageHistory(
+            session_id=str(session_id), collection=self.collection, client=self.client_factory()
+        )
+        return [{"type": message.type, "content": message.content} for message in legacy.messages[-limit:]]
+
+    def append(self, session_id, messages):
+        """Writes all messages and the version bump in one batched commit."""
+        from google.cloud import firestore
+
+        client = self.client_factory()
+        batch = client.batch()
+        batch.set(self._session(session_id), {VERSION_FIELD: firestore.Increment(1)}, merge=True)
+        created_at = time.time()
+        for offset, message in enumerate(messages):
+            batch.set(self._messages(session_id).document(), {
+                **message,
+                "created_at": created_at + offset * 1e-6  # Keeps a turn's user message before its AI reply
+            })
+        batch.commit()
+
+
+class InMemoryHistoryBackend:
+    """Drop-in fake for FirestoreHistoryBackend."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def tail(self, session_id, limit):
+        with self.lock:
+            return list(self.sessions.get(str(session_id), [])[-limit:])
+
+    async def atail(self, session_id, limit):
+        return self.tail(session_id, limit)
+
+    def version(self, session_id):
+        with self.lock:
+            return self.versions.get(str(session_id), 0)
+
+    async def aversion(self, session_id):
+        return self.version(session_id)
+
+    def append(self, session_id, messages):
+        with self.lock:
+            self.sessions.setdefault(str(session_id), []).extend(dict(message) for message in messages)
+            self.versions[str(session_id)] = self.versions.get(str(session_id), 0) + 1
+
+
+class CachedSession:
+    __slots__ = ("messages", "loaded_at", "version", "pending_writes")
+
+    def __init__(self, messages, version):
+        self.messages = messages
+        self.loaded_at = time.monotonic()
+        self.version = version  # Backend version the messages were read at; None once our own write changes it
+        self.pending_writes = 0
+
+
+class ChatHistoryStore:
+    """Tail-only history reads with a per-session cache of recent messages and write-behind turns.
+
+    A cached tail is served while this process still has writes of its own queued for the session
+    (it's then ahead of the backend), or while the backend's session version still matches the one
+    it was read at. Checking the version costs a single-field read instead of a tail query.
+    """
+
+    def __init__(self, backend, cache_size=20, max_sessions=10000, cache_ttl=300):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.max_sessions = max_sessions
+        self.cache_ttl = cache_ttl
+        self.sessions = OrderedDict()  # session_id -> CachedSession
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")  # Keeps writes in order
+        self.hits = 0
+        self.misses = 0
+        self.write_failures = 0
+
+    def _cached(self, session_id, limit, version=None):
+        """The cached tail if it has writes of ours in flight, or was read at the given version."""
+        with self.lock:
+            cached = self.sessions.get(session_id)
+            if not cached or time.monotonic() - cached.loaded_at >= self.cache_ttl:
+                return None
+            if cached.pending_writes or (version is not None and cached.version == version):
+                self.hits += 1
+                self.sessions.move_to_end(session_id)
+                return list(cached.messages)[-limit:]
+        return None
+
+    def _loaded(self, session_id, messages, limit, version):
+        with self.lock:
+            self.misses += 1
+            self._cache(session_id, CachedSession(deque(messages, maxlen=self.cache_size), version))
+        return messages[-limit:]
+
+    def recent(self, session_id, limit=5):
+        """Returns the last `limit` messages (oldest first) as {"type": "human"|"ai", "content": ...}."""
+        session_id = str(session_id)
+        cached = self._cached(session_id, limit)
+        if cached is not None:
+            return cached
+        with span("history_read"):
+            # Read before the tail, so a write landing in between leaves the cache stale rather than wrong
+            version = self.backend.version(session_id)
+            cached = self._cached(session_id, limit, version)
+            if cached is not None:
+                return cached
+            messages = self.backend.tail(session_id, max(limit, self.cache_size))
+        return self._loaded(session_id, messages, limit, version)
+
+    async def arecent(self, session_id, limit=5):
+        """Async version of recent()."""
+        session_id = str(session_id)
+        cached = self._cached(session_id, limit)
+        if cached is not None:
+            return cached
+        with span("history_read"):
+            version = await self.backend.aversion(session_id)
+            cached = self._cached(session_id, limit, version)
+            if cached is not None:
+                return cached
+            messages = await self.backend.atail(session_id, max(limit, self.cache_size))
+        return self._loaded(session_id, messages, limit, version)
+
+    def append_turn(self, session_id, user_message, ai_message):
+        """Records a turn in the cache right away and persists it with one batched background commit."""
+        session_id = str(session_id)
+        messages = []
+        if user_message:
+            messages.append({"type": "human", "content": user_message})
+        messages.append({"type": "ai", "content": ai_message})
+
+        with self.lock:
+            cached = self.sessions.get(session_id)
+            if cached:
+                cached.messages.extend(messages)
+                cached.pending_writes += 1
+                self.sessions.move_to_end(session_id)
+
+        return self.writer.submit(self._write, session_id, messages)
+
+    def _write(self, session_id, messages):
+        try:
+            with span("history_write"):
+                self.backend.append(session_id, messages)
+        except Exception as e:
+            logger.error(f"Failed to persist chat history for session {session_id}: {e}")
+            with self.lock:
+                self.write_failures += 1
+                self.sessions.pop(session_id, None)  # Don't keep serving messages that were never stored
+            raise
+
+        with self.lock:
+            cached = self.sessions.get(session_id)
+            if cached and cached.pending_writes:
+                cached.pending_writes -= 1
+                # Another worker may have written in between, so the new version isn't known; re-read next time
+                cached.version = None
+
+    def _cache(self, session_id, cached):
+        self.sessions[session_id] = cached
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def flush(self):
+        """Blocks until all queued writes are committed."""
+        self.writer.submit(lambda: None).result()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "write_failures": self.write_failures,
+                "sessions": len(self.sessions)
+            }
@@ -0,0 +1,52 @@
+"""Per-request time budget, visible to every stage of a request through a context variable.
+
+Threads started with contextvars.copy_context().run (and asyncio tasks / to_thread) see the
+budget of the request that started them.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.app.utils.metrics import degraded_stages
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+
+_current_budget = contextvars.ContextVar("request_budget", default=None)
+
+
+class RequestBudget:
+    def __init__(self, seconds=REQUEST_DEADLINE_SECONDS):
+        self.deadline = time.monotonic() + seconds
+        self.degraded = []  # [{"stage": ..., "reason": ...}] in the order stages were degraded
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def degrade(self, stage, reason):
+        with self.lock:
+            self.degraded.append({"stage": stage, "reason": reason})
+        degraded_stages.inc(stage, reason)
+
+
+@contextmanager
+def request_budget(seconds=REQUEST_DEADLINE_SECONDS):
+    """Makes a fresh RequestBudget the current one for the duration of the block."""
+    budget = RequestBudget(seconds)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget():
+    return _current_budget.get()
+
+
+def remaining_time():
+    """Seconds left in the current request's budget, or None outside a request."""
+    budget = _current_budget.get()
+    return budget.remaining() if budget else None
@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from backend.app.utils.media import CHUNK_SIZE, read_media
+
+
+def hash_media(media):
+    """SHA-256 of the raw media bytes. File-like objects are hashed in chunks and rewound."""
+    digest = hashlib.sha256()
+    if isinstance(media, (str, bytes, bytearray, memoryview)):
+        digest.update(read_media(media) if isinstance(media, str) else media)
+        return digest.hexdigest()
+
+    media.seek(0)
+    for chunk in iter(lambda: media.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    media.seek(0)
+    return digest.hexdigest()
+
+
+class DescriptionCache:
+    """LRU + TTL cache of media descriptions, with an optional sharded on-disk tier.
+
+    Keys are content addresses: a hash of the media bytes plus the prompt and model that produced
+    the description, so a prompt or model change never serves a stale description. Writes sweep the
+    disk tier at most every sweep_interval seconds, removing expired files and then the oldest ones
+    until it fits in disk_max_bytes. Several processes may share the directory, so files another
+    one already removed are skipped.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=24 * 3600, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024,
+                 sweep_interval=600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = sweep_interval
+        self.swept_at = 0.0
+        self.entries = OrderedDict()  # key -> (description, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def make_key(media_hash, *parts):
+        digest = hashlib.sha256(media_hash.encode("utf-8"))
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.entries.pop(key, None)
+
+        description = self._read_disk(key, now)
+        with self.lock:
+            if description is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, description, now)
+        return description
+
+    def put(self, key, description):
+        now = time.time()
+        self._remember(key, description, now)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"description": description, "created_at": now}, f)
+            os.replace(temp_path, path)
+
+            with self.lock:
+                sweep = now - self.swept_at >= self.sweep_interval
+                if sweep:
+                    self.swept_at = now
+            if sweep:
+                self.sweep_disk(now)
+
+    def sweep_disk(self, now=None):
+        """Removes expired descriptions from the disk tier, then the oldest until it fits in disk_max_bytes."""
+        now = now or time.time()
+        removed = 0
+        files = []  # (mtime, size, path)
+        total = 0
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime + self.ttl_seconds <= now:
+                    removed += self._remove(entry.path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+
+        with self.lock:
+            self.disk_evictions += removed
+
+    @staticmethod
+    def _remove(path):
+        """Deletes a cache file; returns 0 if another reader or process got there first."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return 1
+
+    def _remember(self, key, description, now):
+        with self.lock:
+            self.entries[key] = (description, now + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if entry["created_at"] + self.ttl_seconds <= now:
+            self._remove(path)
+            return None
+        return entry["description"]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries)
+            }
+
+
+description_cache = DescriptionCache(
+    max_entries=int(os.getenv("DESCRIPTION_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=int(os.getenv("DESCRIPTION_CACHE_TTL_SECONDS", str(24 * 3600))),
+    disk_dir=os.getenv("DESCRIPTION_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("DESCRIPTION_CACHE_DISK_MAX_MB", "1024")) * 1024 * 1024
+)
+
+# Descriptions that signal a failed call are never cached
+FAILED_DESCRIPTION_PREFIXES = ("Could not generate", "Error:")
+
+
+def cached_description(modality, model, prompt):
+    """Decorates a describer(media) so repeated uploads of the same media return the cached description.
+
+    Works for both plain and async describers. For async ones, hashing the upload and the disk
+    tier's reads and writes run in a worker thread, so a large upload doesn't stall the event loop.
+    """
+    def remember(key, description):
+        if isinstance(description, str) and not description.startswith(FAILED_DESCRIPTION_PREFIXES):
+            description_cache.put(key, description)
+        return description
+
+    def decorator(describer):
+        if inspect.iscoroutinefunction(describer):
+            @functools.wraps(describer)
+            async def async_wrapper(media):
+                media_hash = await asyncio.to_thread(hash_media, media)
+                key = description_cache.make_key(media_hash, modality, model, prompt)
+                description = await asyncio.to_thread(description_cache.get, key)
+                if description is not None:
+                    return description
+                return await asyncio.to_thread(remember, key, await describer(media))
+
+            return async_wrapper
+
+        @functools.wraps(describer)
+        def wrapper(media):
+            key = description_cache.make_key(hash_media(media), modality, model, prompt)
+            description = description_cache.get(key)
+            if description is not None:
+                return description
+            return remember(key, describer(media))
+
+        return wrapper
+
+    return decorator
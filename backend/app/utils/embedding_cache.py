@@ -0,0 +1,134 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Cache key for a query: case, surrounding punctuation and repeated whitespace don't change it.
+
+    bge-small-en is uncased, so lowercasing doesn't change the embedding either.
+    """
+    return WHITESPACE_PATTERN.sub(" ", text.lower()).strip(" \t\n.,!?;:'\"")
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with a bounded LRU cache for query embeddings.
+
+    With shared_path set, embeddings are also kept in a SQLite file that every worker process reads
+    and writes, so a query embedded by one worker is a cache hit for all of them. That file is capped
+    at max_shared_entries, evicting the least recently used rows on write. Document embeddings
+    (index builds) pass straight through.
+    """
+
+    def __init__(self, embeddings, max_entries=4096, shared_path=None, max_shared_entries=100000):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.max_shared_entries = max_shared_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.shared_evictions = 0
+
+        self.shared = None
+        if shared_path:
+            os.makedirs(os.path.dirname(os.path.abspath(shared_path)), exist_ok=True)
+            self.shared = sqlite3.connect(shared_path, check_same_thread=False, timeout=1)
+            self.shared.execute("PRAGMA journal_mode=WAL")
+            self.shared.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self.shared.execute("PRAGMA table_info(query_embeddings)")}
+            if "last_used" not in columns:  # Files written before eviction; their rows go first
+                self.shared.execute("ALTER TABLE query_embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self.shared.execute("CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)")
+            self.shared.commit()
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+
+        vector = self._read_shared(key)
+        if vector is not None:
+            with self.lock:
+                self.shared_hits += 1
+        else:
+            vector = self.embeddings.embed_query(key)
+            with self.lock:
+                self.misses += 1
+            self._write_shared(key, vector)
+
+        with self.lock:
+            self.entries[key] = tuple(vector)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return list(vector)
+
+    def _read_shared(self, key):
+        if self.shared is None:
+            return None
+        try:
+            with self.lock:
+                row = self.shared.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self.shared.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self.shared.commit()
+        except sqlite3.OperationalError:  # Locked by another worker; just compute it
+            return None
+        return array("f", row[0]).tolist() if row else None
+
+    def _write_shared(self, key, vector):
+        if self.shared is None:
+            return
+        try:
+            with self.lock:
+                self.shared.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    (key, array("f", vector).tobytes(), time.time())
+                )
+                self._evict_shared()
+                self.shared.commit()
+        except sqlite3.OperationalError:
+            pass
+
+    def _evict_shared(self):
+        excess = self.shared.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] - self.max_shared_entries
+        if excess <= 0:
+            return
+
+        self.shared.execute(
+            "DELETE FROM query_embeddings WHERE key IN "
+            "(SELECT key FROM query_embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self.shared_evictions += excess
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "shared_evictions": self.shared_evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries)
+            }
@@ -1,27 +1,40 @@
 import json
 import os
+import re
+
+from backend.app.utils.answer_store import AnswerStore
+from backend.app.utils.guide_store import GuideStore, build_guide_store
+from backend.app.utils.registry import PERSIST_DIRECTORY, get_generative_model
+from backend.app.utils.llm_client import llm_client
+from backend.app.utils.prompt_compaction import compact_guide
 
 current_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the current file
 json_dir = os.path.abspath(os.path.join(current_dir, "..", "..", "data", "clean_data")) # Get the directory of the JSON files
 
-def extract_final_data(metadata: dict):
-    """Extracts relevant fields from the JSON file using the given metadata."""
-    file_name = metadata.get("filename")
-    if not file_name:
-        return {"error": "Filename not provided in metadata"}
-    
-    file_path = os.path.join(json_dir, file_name) # Get the full path of the JSON file
-    
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        return {"error": f"File not found: {file_path}"}
-    except json.JSONDecodeError:
-        return {"error": "Invalid JSON format"}
-    except Exception as e:
-        return {"error": f"Failed to read JSON file: {str(e)}"}
-    
+RENDER_MODEL = "gemini-2.0-flash"
+RENDER_PROMPT = "From the following code, give me every step and any sort of title and description related to that step, and any image links related to that step too. Also, give me the embed code, and the tools required as well. Your response should be as if you're an AI Repair Agent."
+RENDER_FAILED = "Could not generate description."
+
+# Final answers rendered for each guide when the vector DB is built
+answer_store = AnswerStore(os.path.join(PERSIST_DIRECTORY, "rendered_answers.sqlite3"))
+
+# Pre-extracted fields of every guide, rebuilt whenever the vector DB is regenerated
+guide_store = GuideStore(
+    os.path.abspath(os.path.join(current_dir, "..", "..", "data", "guide_store", "guides.bin")),
+    max_decoded=int(os.getenv("GUIDE_STORE_DECODED_ENTRIES", "256"))
+)
+
+def clean_text(text):
+    """Cleans LLM-generated text while preserving actual content."""
+    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
+    text = re.sub(r"\*(.*?)\*", r"\1", text)
+    text = re.sub(r"_(.*?)_", r"\1", text)
+    text = re.sub(r"`(.*?)`", r"\1", text)
+    text = re.sub(r"<.*?>", "", text)
+    return text.strip()
+
+def extract_fields(data: dict):
+    """Extracts the fields used for the final answer from a cleaned guide."""
     response = {}
     
     # Extract 'title' from root or metadata
@@ -51,3 +64,89 @@ def extract_final_data(metadata: dict):
     
     return response
 
+def rebuild_guide_store():
+    """Regenerates the guide store from clean_data and maps the new file in this process."""
+    count = build_guide_store(json_dir, guide_store.path, extract_fields)
+    guide_store.reload()
+    return count
+
+def extract_final_data(metadata: dict):
+    """Extracts relevant fields from the JSON file using the given metadata."""
+    file_name = metadata.get("filename")
+    if not file_name:
+        return {"error": "Filename not provided in metadata"}
+
+    # Served from the memory-mapped guide store when the guide is in it
+    stored = guide_store.get(file_name)
+    if stored is not None:
+        return dict(stored)
+    
+    file_path = os.path.join(json_dir, file_name) # Get the full path of the JSON file
+    
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"error": f"File not found: {file_path}"}
+    except json.JSONDecodeError:
+        return {"error": "Invalid JSON format"}
+    except Exception as e:
+        return {"error": f"Failed to read JSON file: {str(e)}"}
+    
+    return extract_fields(data)
+
+def render_prompt(final_data):
+    """The render prompt with the guide fields as compact JSON; every step is passed on in full."""
+    guide = compact_guide(final_data, None, "render", original=str(final_data))
+    return f"""{RENDER_PROMPT}
+
+        {guide}
+        """
+
+def render_final_answer(final_data, client=llm_client):
+    """Formats the extracted guide data into the user-facing answer with Gemini, through the given LLMClient."""
+    model = get_generative_model(RENDER_MODEL)
+    prompt = render_prompt(final_data)
+    response = client.call(lambda timeout: model.generate_content(prompt, request_options={"timeout": timeout}))
+    return clean_text(response.text) if response and hasattr(response, "text") else RENDER_FAILED
+
+def stream_final_answer(final_data):
+    """Like render_final_answer, but yields the raw answer text chunk by chunk as Gemini generates it."""
+    model = get_generative_model(RENDER_MODEL)
+    prompt = render_prompt(final_data)
+    # Only opening the stream is retried; a stream that breaks off midway isn't restarted
+    response = llm_client.call(lambda timeout: model.generate_content(prompt, stream=True, request_options={"timeout": timeout}))
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:  # Chunks without text parts, e.g. a blocked candidate
+            continue
+        if text:
+            yield text
+
+async def render_final_answer_async(final_data):
+    """Async version of render_final_answer, for the asyncio request path."""
+    model = get_generative_model(RENDER_MODEL)
+    prompt = render_prompt(final_data)
+    response = await llm_client.acall(lambda timeout: model.generate_content_async(prompt, request_options={"timeout": timeout}))
+    return clean_text(response.text) if response and hasattr(response, "text") else RENDER_FAILED
+
+async def stream_final_answer_async(final_data):
+    """Async version of stream_final_answer."""
+    model = get_generative_model(RENDER_MODEL)
+    prompt = render_prompt(final_data)
+    response = await llm_client.acall(lambda timeout: model.generate_content_async(prompt, stream=True, request_options={"timeout": timeout}))
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+def get_rendered_answer(metadata: dict):
+    """Returns the answer pre-rendered at index time for the matched guide, or None if it's missing or stale."""
+    file_name = metadata.get("filename")
+    if not file_name:
+        return None
+    return answer_store.get(file_name, os.path.join(json_dir, file_name))
@@ -0,0 +1,126 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+MAGIC = b"GSTORE01"
+HEADER = struct.Struct("<8sQ")  # magic, length of the JSON offset index that follows
+
+
+def build_guide_store(json_dir, path, extract):
+    """Builds the guide store file from every guide in json_dir.
+
+    Layout: header | offset index (JSON, {filename: [offset, length]}) | records (compact JSON of
+    extract(guide)). Records are streamed to disk one at a time, and the finished file atomically
+    replaces the old one, so readers never see a partial store. Returns the number of guides stored.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records_path = f"{path}.records.tmp"
+    index = {}
+    offset = 0
+
+    with open(records_path, "wb") as records:
+        for file_name in sorted(f for f in os.listdir(json_dir) if f.endswith(".json")):
+            try:
+                with open(os.path.join(json_dir, file_name), "r", encoding="utf-8") as f:
+                    record = extract(json.load(f))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+
+            encoded = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            records.write(encoded)
+            index[file_name] = [offset, len(encoded)]
+            offset += len(encoded)
+
+    encoded_index = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as store, open(records_path, "rb") as records:
+        store.write(HEADER.pack(MAGIC, len(encoded_index)))
+        store.write(encoded_index)
+        while chunk := records.read(1024 * 1024):
+            store.write(chunk)
+
+    os.replace(temp_path, path)
+    os.remove(records_path)
+    return len(index)
+
+
+class GuideStore:
+    """Read side of the guide store: a memory-mapped file with an offset index keyed by filename.
+
+    Lookups are a dict lookup plus a slice of the mapping. The max_decoded most recently used records
+    are kept decoded, so repeated matches of popular guides involve no JSON parsing, while the rest of
+    the corpus stays in the shared page cache rather than in each worker's private memory. The file
+    is re-mapped when it changes on disk (checked at most every reload_interval seconds), so a
+    regenerated corpus is picked up without a restart.
+    """
+
+    def __init__(self, path, reload_interval=5.0, max_decoded=256):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.max_decoded = max_decoded
+        self.lock = threading.Lock()
+        self.state = None  # (mtime_ns, mapping, data_start, index, decoded records)
+        self.checked_at = 0.0
+
+    def reload(self):
+        """Maps the current store file. Returns False if there is no store yet."""
+        try:
+            with open(self.path, "rb") as f:
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            with self.lock:
+                self.state = None
+            return False
+
+        magic, index_length = HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a guide store")
+
+        data_start = HEADER.size + index_length
+        index = json.loads(mapping[HEADER.size:data_start])
+        with self.lock:
+            # The previous mapping is closed when the last reader drops its reference
+            self.state = (mtime_ns, mapping, data_start, index, OrderedDict())
+        return True
+
+    def _current_state(self):
+        now = time.monotonic()
+        if now - self.checked_at >= self.reload_interval:
+            self.checked_at = now
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime_ns = None
+            if self.state is None or self.state[0] != mtime_ns:
+                self.reload()
+        return self.state
+
+    def get(self, file_name):
+        """Returns the pre-extracted fields of the guide, or None if it isn't in the store."""
+        state = self._current_state()
+        if state is None:
+            return None
+
+        _, mapping, data_start, index, decoded = state
+        with self.lock:
+            record = decoded.get(file_name)
+            if record is not None:
+                decoded.move_to_end(file_name)
+                return record
+
+        location = index.get(file_name)
+        if location is None:
+            return None
+        offset, length = location
+        record = json.loads(mapping[data_start + offset:data_start + offset + length])
+
+        with self.lock:
+            decoded[file_name] = record
+            while len(decoded) > self.max_decoded:
+                decoded.popitem(last=False)
+        return record
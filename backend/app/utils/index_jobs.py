@@ -0,0 +1,161 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+
+from filelock import FileLock, Timeout
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+RESUMABLE_STATUSES = ("interrupted", "failed", "cancelled")
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class BuildInProgress(RuntimeError):
+    """Raised when another build already holds the persist directory."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a build once its job has been cancelled."""
+
+
+class IndexJobStore:
+    """Background index-build jobs, persisted as one JSON file per job.
+
+    Every update is a locked read-modify-write of the job file, so any worker process can report on
+    or cancel a job that another process runs. The process running a job holds the job's claim, a
+    file lock the OS releases when the process dies; active jobs whose claim is free are reported
+    as "interrupted" and can be resumed. (A PID check can't tell: after a container restart the
+    same PIDs and hostname come back.)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.claims = {}  # job_id -> FileLock held by this process
+        self.claims_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _claim_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.claim")
+
+    def claim(self, job_id):
+        """Marks the job as run by this process until release(job_id), or until the process dies."""
+        lock = FileLock(self._claim_path(job_id), thread_local=False)  # Released by the job's own thread
+        lock.acquire(timeout=0)
+        with self.claims_lock:
+            self.claims[job_id] = lock
+
+    def release(self, job_id):
+        with self.claims_lock:
+            lock = self.claims.pop(job_id, None)
+        if lock:
+            lock.release()
+
+    def claimed(self, job_id):
+        """Whether some live process (this one included) holds the job's claim."""
+        probe = FileLock(self._claim_path(job_id))
+        try:
+            probe.acquire(timeout=0)
+        except Timeout:
+            return True
+        probe.release()
+        return False
+
+    def _read(self, job_id):
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, job):
+        temp_path = f"{self._path(job['id'])}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=1)
+        os.replace(temp_path, self._path(job["id"]))
+
+    def create(self, params):
+        """Stores a new queued job, claimed by this process."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "params": params,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "stage": None,
+            "processed": 0,
+            "total": None,
+            "throughput_per_second": None,
+            "eta_seconds": None,
+            "resumes": 0,
+            "result": None,
+            "error": None,
+            "host": socket.gethostname(),
+            "pid": os.getpid()
+        }
+        self.claim(job["id"])
+        self._write(job)
+        return job
+
+    def update(self, job_id, **fields):
+        """Merges fields into the stored job and returns it. A pending cancellation is never overwritten by "running"."""
+        with FileLock(f"{self._path(job_id)}.lock"):
+            job = self._read(job_id)
+            if job is None:
+                return None
+            if job["status"] == "cancelling" and fields.get("status") == "running":
+                fields.pop("status")
+            job.update(fields)
+            self._write(job)
+            return job
+
+    def get(self, job_id):
+        job = self._read(job_id)
+        if job and job["status"] in ACTIVE_STATUSES and not self.claimed(job_id):
+            job = self.update(job_id, status="interrupted", finished_at=time.time())
+        return job
+
+    def list(self):
+        job_ids = [name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")]
+        jobs = [job for job in map(self.get, job_ids) if job]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def active(self):
+        return next((job for job in self.list() if job["status"] in ACTIVE_STATUSES), None)
+
+
+class JobProgress:
+    """Progress hook for build_vector_db: records processed/total, throughput and ETA per stage,
+    and raises JobCancelled at the next checkpoint once the job is cancelled."""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.stage = None
+        self.stage_started_at = None
+
+    def __call__(self, stage, processed, total):
+        now = time.monotonic()
+        if stage != self.stage:
+            self.stage, self.stage_started_at = stage, now
+
+        elapsed = now - self.stage_started_at
+        throughput = processed / elapsed if processed and elapsed > 0 else None
+        job = self.store.update(
+            self.job_id,
+            stage=stage,
+            processed=processed,
+            total=total,
+            throughput_per_second=throughput,
+            eta_seconds=(total - processed) / throughput if throughput else None
+        )
+        if job is None or job["status"] == "cancelling":
+            raise JobCancelled()
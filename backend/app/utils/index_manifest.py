@@ -0,0 +1,52 @@
+import hashlib
+import json
+import os
+
+
+def hash_bytes(data):
+    """Returns the SHA-256 hex digest of the given bytes (or str)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class IndexManifest:
+    """Tracks which guides are in the vector DB: file name -> content hash, summary hash and Chroma id."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.exists = os.path.exists(path)
+        if self.exists:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+
+    def diff(self, content_hashes):
+        """Compares current file hashes against the manifest.
+
+        Returns (changed, removed): files that are new or whose content changed, and manifest
+        entries whose files no longer exist.
+        """
+        changed = [name for name, content_hash in content_hashes.items()
+                   if self.entries.get(name, {}).get("content_hash") != content_hash]
+        removed = [name for name in self.entries if name not in content_hashes]
+        return changed, removed
+
+    def update(self, filename, content_hash, summary, chroma_id):
+        self.entries[filename] = {
+            "content_hash": content_hash,
+            "summary_hash": hash_bytes(summary),
+            "chroma_id": chroma_id
+        }
+
+    def remove(self, filename):
+        return self.entries.pop(filename, None)
+
+    def save(self):
+        """Writes the manifest atomically so an interrupted save never leaves a truncated file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.exists = True
@@ -0,0 +1,159 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+(?:-[A-Za-z0-9]+)*")
+# Model numbers and error codes: tokens containing a digit (WM3488HW, E03). All-letter words are
+# never codes, so brand names and acronyms (LG, TV) can't pin a query to one guide
+CODE_PATTERN = re.compile(r"^(?=.*\d)[a-z0-9-]{2,}$")
+
+
+def tokenize(text):
+    """Lowercased alphanumeric tokens. Hyphenated tokens (WM-3488) also yield their joined form."""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text or ""):
+        token = match.lower()
+        if "-" in token:
+            tokens.append(token.replace("-", ""))
+            tokens.extend(token.split("-"))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def extract_codes(text):
+    """Model numbers and error codes mentioned in the text, normalized like tokenize()."""
+    return {token for token in tokenize(text) if CODE_PATTERN.match(token)}
+
+
+class LexicalIndex:
+    """In-process BM25 index over guide titles and summaries, with an exact model/error-code lookup.
+
+    The index is persisted as JSON next to the Chroma collection, one entry per guide:
+    {filename: {"metadata": {...}, "terms": {token: tf}, "codes": [...]}}. Readers re-load it when
+    the file changes on disk (checked at most every reload_interval seconds).
+    """
+
+    def __init__(self, path, reload_interval=5.0, k1=1.5, b=0.75):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.k1 = k1
+        self.b = b
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.loaded_mtime_ns = None
+        self.checked_at = 0.0
+        self._build_postings()
+
+    # Write side, used by the vector DB build
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            entries, mtime_ns = {}, None
+
+        with self.lock:
+            self.entries = entries
+            self.loaded_mtime_ns = mtime_ns
+            self._build_postings()
+        return self
+
+    def update(self, filename, metadata, text):
+        """Indexes a guide. text is what it's searchable by, e.g. its title and summary."""
+        self.entries[filename] = {
+            "metadata": metadata,
+            "terms": dict(Counter(tokenize(text))),
+            "codes": sorted(extract_codes(text))
+        }
+
+    def remove(self, filename):
+        self.entries.pop(filename, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    # Read side, used by the search tool
+
+    def _build_postings(self):
+        """Rebuilds the read-side structures off to the side and swaps them in with one assignment,
+        so searches running during a reload (without the lock) see either the old index or the new one."""
+        postings = defaultdict(list)  # token -> [(filename, tf)]
+        code_postings = defaultdict(set)  # code -> {filename}
+        lengths = {}
+        for filename, entry in self.entries.items():
+            lengths[filename] = sum(entry["terms"].values())
+            for token, tf in entry["terms"].items():
+                postings[token].append((filename, tf))
+            for code in entry["codes"]:
+                code_postings[code].add(filename)
+        average_length = sum(lengths.values()) / len(lengths) if lengths else 0.0
+        self.snapshot = (self.entries, postings, code_postings, lengths, average_length)
+
+    def refresh(self):
+        """Re-loads the index if the file on disk changed since it was loaded."""
+        now = time.monotonic()
+        if now - self.checked_at < self.reload_interval:
+            return
+        self.checked_at = now
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns != self.loaded_mtime_ns:
+            self.load()
+
+    def metadata(self, filename):
+        """Metadata of a guide as of the last load, consistent with what search() and exact_match() return."""
+        entry = self.snapshot[0].get(filename)
+        return dict(entry["metadata"]) if entry else None
+
+    def exact_match(self, query):
+        """Returns the one guide matching the query's model numbers/error codes, or None.
+
+        All codes in the query that the index knows about must point at the same single guide;
+        if they don't narrow it down to one, or two of them point at different guides, the query
+        isn't an exact hit.
+        """
+        code_postings = self.snapshot[2]
+        candidates = None
+        for code in extract_codes(query):
+            filenames = code_postings.get(code)
+            if not filenames:
+                continue
+            candidates = filenames if candidates is None else candidates & filenames
+            if not candidates:
+                return None  # The codes disagree, e.g. two models' numbers in one query
+
+        if candidates and len(candidates) == 1:
+            return next(iter(candidates))
+        return None
+
+    def search(self, query, k=5):
+        """BM25 top-k as [(filename, score)], best first."""
+        _, postings_by_token, _, lengths, average_length = self.snapshot
+        if not lengths:
+            return []
+
+        scores = defaultdict(float)
+        document_count = len(lengths)
+        for token in set(tokenize(query)):
+            postings = postings_by_token.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for filename, tf in postings:
+                length_norm = 1 - self.b + self.b * lengths[filename] / average_length
+                scores[filename] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
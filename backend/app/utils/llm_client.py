@@ -0,0 +1,259 @@
+"""Shared call layer for every Gemini / Vertex AI request.
+
+Call sites pass a function that makes one request given the seconds left until its deadline
+(call_fn(timeout)); llm_client.call runs it under the process-wide token bucket, retries transient
+failures with exponential backoff and jitter up to a maximum attempt count, and fails fast with
+CircuitOpen while the API keeps failing. The model clients themselves are pooled in the registry.
+
+To test against a local fake LLM server, set GEMINI_API_ENDPOINT (and VERTEX_API_ENDPOINT) to its
+address; the registry then builds its clients against it over REST.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+from backend.app.utils.rate_limiter import RateLimiter
+from backend.app.utils.deadline import remaining_time
+from backend.app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and rejects calls for reset_timeout seconds.
+
+    After that, one trial call is let through (half-open): success closes the circuit, failure opens it again,
+    and a trial that ends any other way (e.g. cancelled at a deadline) is released for the next call to retry.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpen if the call can't go ahead; returns True if it's the half-open trial."""
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                raise CircuitOpen("LLM API circuit is open after repeated failures")
+            self.trial_in_flight = True
+            return True
+
+    def release_trial(self):
+        """Lets another call be the trial, without counting the abandoned one as a success or failure."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Opening LLM circuit after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half_open"
+
+
+def is_retryable(error):
+    """Client errors (bad request, auth, not found) won't succeed on retry; rate limits and server errors may."""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return True
+
+    if isinstance(error, (exceptions.TooManyRequests, exceptions.ResourceExhausted)):
+        return True
+    return not isinstance(error, (exceptions.ClientError, exceptions.PermissionDenied, exceptions.FailedPrecondition))
+
+
+class LLMClient:
+    def __init__(self, requests_per_minute=0, burst=1, max_attempts=4, backoff_base=1.0, backoff_max=30.0,
+                 timeout=60.0, breaker=None):
+        self.limiter = RateLimiter(requests_per_minute, burst)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _backoff(self, attempt, remaining):
+        """Full-jitter exponential backoff, never sleeping past the deadline."""
+        return min(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))), max(0.0, remaining))
+
+    def _deadline(self, timeout):
+        """The call's deadline: its own timeout, cut short by the current request's budget if there is one."""
+        seconds = timeout or self.timeout
+        budget_left = remaining_time()
+        if budget_left is not None:
+            if budget_left <= 0:
+                raise TimeoutError("Request deadline exceeded before the LLM call")
+            seconds = min(seconds, budget_left)
+        return time.monotonic() + seconds
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _before_attempt(self):
+        """Returns True if the attempt is the breaker's half-open trial."""
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpen:
+            self._count("rejected")
+            raise
+        self._count("calls")
+        return trial
+
+    def _after_failure(self, error, attempt, max_attempts, deadline):
+        """Records a failed attempt; returns how long to wait before retrying, or re-raises."""
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # The API answered, it just rejected this request
+
+        remaining = deadline - time.monotonic()
+        if not retryable or attempt >= max_attempts or remaining <= 0:
+            self._count("failures")
+            raise error
+
+        self._count("retries")
+        logger.warning(f"LLM call failed (attempt {attempt}/{max_attempts}), retrying: {error}")
+        return self._backoff(attempt, remaining)
+
+    def call(self, call_fn, timeout=None, max_attempts=None, limiter=None):
+        """Runs call_fn(timeout) with rate limiting, retries, a deadline and the circuit breaker.
+
+        timeout bounds the whole call including retries, and is capped by the current request's deadline;
+        limiter is an extra budget to acquire per attempt.
+        """
+        max_attempts = max_attempts or self.max_attempts
+        deadline = self._deadline(timeout)
+
+        for attempt in range(1, max_attempts + 1):
+            trial = self._before_attempt()
+            try:
+                self.limiter.acquire()
+                if limiter:
+                    limiter.acquire()
+                try:
+                    with span("llm_call"):
+                        result = call_fn(max(1.0, deadline - time.monotonic()))
+                except Exception as e:
+                    delay = self._after_failure(e, attempt, max_attempts, deadline)
+                else:
+                    self.breaker.record_success()
+                    return result
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            time.sleep(delay)
+
+    async def acall(self, call_fn, timeout=None, max_attempts=None):
+        """Async version of call(); call_fn(timeout) returns an awaitable, which is cancelled at the deadline."""
+        max_attempts = max_attempts or self.max_attempts
+        deadline = self._deadline(timeout)
+
+        for attempt in range(1, max_attempts + 1):
+            trial = self._before_attempt()
+            try:
+                if self.limiter.requests_per_minute:
+                    await asyncio.to_thread(self.limiter.acquire)
+                remaining = max(1.0, deadline - time.monotonic())
+                try:
+                    with span("llm_call"):
+                        result = await asyncio.wait_for(call_fn(remaining), remaining)
+                except Exception as e:
+                    delay = self._after_failure(e, attempt, max_attempts, deadline)
+                else:
+                    self.breaker.record_success()
+                    return result
+            except BaseException:
+                # Cancellation (a caller's wait_for timing out) isn't an Exception; don't leave the trial taken
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "circuit": self.breaker.state
+            }
+
+
+def guarded(chat_model, stop=None):
+    """Wraps a LangChain chat model so chains that call it (e.g. the ReAct agent) go through llm_client."""
+    from langchain_core.runnables import RunnableLambda
+
+    bound = chat_model.bind(stop=stop) if stop else chat_model
+
+    def invoke(messages):
+        return llm_client.call(lambda timeout: bound.invoke(messages))
+
+    async def ainvoke(messages):
+        return await llm_client.acall(lambda timeout: bound.ainvoke(messages))
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+llm_client = LLMClient(
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),  # 0 leaves the process unthrottled
+    burst=int(os.getenv("LLM_BURST", "5")),
+    max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1")),
+    backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30")),
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    )
+)
+
+# Vector DB builds run in the web process but get their own breaker (and their own requests-per-minute
+# budget, passed per call), so a build hitting rate limits never fails live requests fast
+index_llm_client = LLMClient(
+    max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1")),
+    backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30")),
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    )
+)
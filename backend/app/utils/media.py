@@ -0,0 +1,55 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+
+# Uploads larger than this are spooled to a temporary file instead of being held in RAM
+SPOOL_MAX_MEMORY = int(os.getenv("MEDIA_SPOOL_MAX_MEMORY_MB", "8")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+def spool_upload(upload, max_memory=SPOOL_MAX_MEMORY):
+    """Copies an uploaded file into a SpooledTemporaryFile, chunk by chunk.
+
+    Small uploads stay in memory, larger ones roll over to disk. Returns None for empty uploads.
+    The spooled file outlives the request, so describers that are still running after a timeout
+    don't read from an already closed upload stream.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    shutil.copyfileobj(upload.stream if hasattr(upload, "stream") else upload, spooled, CHUNK_SIZE)
+
+    if spooled.tell() == 0:
+        spooled.close()
+        return None
+
+    spooled.seek(0)
+    return spooled
+
+
+def as_binary_stream(media):
+    """Returns a seekable binary file-like object for media given as a file-like object,
+    bytes/memoryview, or (legacy) a base64-encoded string."""
+    if isinstance(media, str):
+        return io.BytesIO(base64.b64decode(media))
+    if isinstance(media, (bytes, bytearray, memoryview)):
+        return io.BytesIO(media)
+
+    media.seek(0)
+    return media
+
+
+def read_media(media):
+    """Returns the raw media bytes, for SDKs that only accept inline bytes.
+
+    bytes are returned as-is, file-like objects are read once from the start.
+    """
+    if isinstance(media, bytes):
+        return media
+    if isinstance(media, (bytearray, memoryview)):
+        return bytes(media)
+    if isinstance(media, str):
+        return base64.b64decode(media)
+
+    media.seek(0)
+    return media.read()
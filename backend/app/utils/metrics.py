@@ -0,0 +1,178 @@
+"""Stage timings, error counts and cache/LLM stats, rendered in the Prometheus text format.
+
+Stages are timed with span() (a context manager) or @timed (for sync and async functions). Each
+span feeds the process-wide latency histogram, counts an error if the stage raised, and is added to
+the current request's timings, which the /main_agent handlers can send back as a Server-Timing
+header. Components that keep their own counters (caches, llm_client) register a stats() callable
+with register_stats and are read when /metrics is scraped.
+
+Metrics are per process: under a multi-worker server, each worker reports its own.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "fixgenie"
+SERVER_TIMING_HEADERS = os.getenv("SERVER_TIMING_HEADERS", "false").lower() == "true"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(dict(zip(self.label_names, label_values)))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.series.items()):
+                labels = dict(zip(self.label_names, label_values))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{format_labels(labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {series[-1]}")
+        return lines
+
+
+stage_seconds = Histogram("stage_duration_seconds", "Time spent per pipeline stage.", ("stage",))
+stage_errors = Counter("stage_errors_total", "Stages that raised, per stage and exception type.", ("stage", "error"))
+degraded_stages = Counter("degraded_stages_total", "Stages skipped or cut short to meet a request deadline.", ("stage", "reason"))
+
+_stats_sources = {}
+
+
+def register_stats(name, stats, label="key"):
+    """Exposes stats() (a dict of numbers, strings or nested dicts) as gauges named {PREFIX}_{name}_{key}.
+
+    The keys of a nested dict become values of the given label.
+    """
+    _stats_sources[name] = (stats, label)
+
+
+@contextmanager
+def span(stage):
+    started_at = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage_errors.inc(stage, type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started_at
+        stage_seconds.observe(elapsed, stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def timed(stage):
+    """Decorator form of span(), for sync and async functions."""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def request_timings():
+    """Collects the spans run while handling one request (including in threads started with a copy of its context)."""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings):
+    """Server-Timing header value with each stage's total duration in ms, in order of first appearance."""
+    totals = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
+
+
+def timing_headers(timings):
+    return {"Server-Timing": server_timing_header(timings)} if SERVER_TIMING_HEADERS and timings else {}
+
+
+def render_stats(name, stats, label="key", labels=None):
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            lines.extend(render_stats(name, value, label, {**(labels or {}), label: key}))
+        elif isinstance(value, bool):
+            lines.append(f"{PREFIX}_{name}_{key}{format_labels(labels)} {int(value)}")
+        elif isinstance(value, (int, float)):
+            lines.append(f"{PREFIX}_{name}_{key}{format_labels(labels)} {value}")
+        elif isinstance(value, str):
+            lines.append(f"{PREFIX}_{name}_{key}{format_labels({**(labels or {}), key: value})} 1")
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = stage_seconds.render() + stage_errors.render() + degraded_stages.render()
+    for name, (stats, label) in sorted(_stats_sources.items()):
+        try:
+            lines.extend(render_stats(name, stats(), label))
+        except Exception as e:
+            stage_errors.inc("metrics", type(e).__name__)
+    return "\n".join(lines) + "\n"
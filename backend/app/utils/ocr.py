@@ -0,0 +1,99 @@
+"""OCR stage for uploaded images.
+
+Images are downscaled, converted to grayscale and binarized in the calling thread. A cheap
+edge-density check then skips Tesseract entirely for photos without visible text. Tesseract itself
+runs in a bounded process pool, so CPU-heavy OCR uses all cores without holding the web worker's GIL.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Longest image side fed to Tesseract; phone photos are far beyond what OCR needs
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "1600"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "20"))
+# Share of strong-edge pixels in a thumbnail below which an image is assumed to contain no text
+OCR_MIN_EDGE_DENSITY = float(os.getenv("OCR_MIN_EDGE_DENSITY", "0.02"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Loads Tesseract's bindings once per worker, so the first image each worker gets isn't slower."""
+    import pytesseract  # noqa: F401
+
+
+def get_pool():
+    """Lazily starts the OCR process pool. Workers are spawned (not forked) so they don't inherit
+    the web server's threads and locks.
+
+    A spawned worker re-imports the main script as __mp_main__ before it runs anything; run.py skips
+    building the app in that case, and any other entry point must guard its side effects the same way
+    (or with `if __name__ == "__main__"`).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def preprocess_image(image, max_dimension=OCR_MAX_DIMENSION):
+    """Returns a downscaled, grayscale, binarized copy of the image ready for Tesseract."""
+    from PIL import ImageOps, ImageStat
+
+    image = ImageOps.exif_transpose(image)  # Phone photos are often stored rotated
+    gray = image.convert("L")
+    gray.thumbnail((max_dimension, max_dimension))  # Only ever shrinks, keeps the aspect ratio
+    gray = ImageOps.autocontrast(gray)
+
+    threshold = ImageStat.Stat(gray).mean[0]
+    return gray.point(lambda pixel: 255 if pixel > threshold else 0)
+
+
+def has_text(gray_image, min_edge_density=OCR_MIN_EDGE_DENSITY):
+    """Cheap text-presence check: text produces dense, sharp edges, plain photos mostly don't."""
+    from PIL import ImageFilter
+
+    thumbnail = gray_image.copy()
+    thumbnail.thumbnail((256, 256))
+    histogram = thumbnail.filter(ImageFilter.FIND_EDGES).histogram()
+    total = sum(histogram)
+    return total > 0 and sum(histogram[128:]) / total >= min_edge_density
+
+
+def _run_tesseract(image):
+    import pytesseract
+    return pytesseract.image_to_string(image)
+
+
+def extract_text(image, timeout=OCR_TIMEOUT):
+    """Runs the full OCR stage on a PIL image and returns the raw extracted text ("" if none)."""
+    prepared = preprocess_image(image)
+    if not has_text(prepared):
+        return ""
+
+    try:
+        return get_pool().submit(_run_tesseract, prepared).result(timeout=timeout)
+    except FutureTimeoutError:
+        logger.warning(f"OCR timed out after {timeout}s")
+        return ""
+    except BrokenProcessPool:
+        logger.error("OCR worker process died, restarting the pool")
+        _reset_pool()
+        return ""
@@ -0,0 +1,82 @@
+"""Compares the old in-thread OCR path with the preprocessed, process-pool OCR stage.
+
+Run from the repository root against a folder of sample images (e.g. phone photos of error screens
+and appliances without any text):
+
+    python -m backend.app.utils.ocr_benchmark path/to/sample_images [--concurrency 4]
+
+For every image it reports the latency of both paths and how many characters each extracted, then
+the throughput of the new path when several requests OCR at the same time.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.utils.ocr import extract_text, get_pool
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def old_path(image):
+    """OCR as the request thread used to run it: full resolution, no preprocessing."""
+    import pytesseract
+    return pytesseract.image_to_string(image)
+
+
+def timed(function, image):
+    started_at = time.perf_counter()
+    text = function(image)
+    return time.perf_counter() - started_at, text
+
+
+def main():
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Benchmark the OCR stage against the old OCR path.")
+    parser.add_argument("image_dir", help="folder with sample images")
+    parser.add_argument("--concurrency", type=int, default=4, help="simultaneous requests for the throughput run")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.image_dir, name) for name in os.listdir(args.image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        print(f"No images found in {args.image_dir}")
+        return 1
+
+    images = []
+    for path in paths:
+        image = Image.open(path)
+        image.load()
+        images.append((os.path.basename(path), image))
+
+    get_pool().submit(int).result()  # Start the worker processes outside the measurements
+
+    print(f"{'image':<32} {'size':>11} {'old ms':>9} {'new ms':>9} {'old chars':>10} {'new chars':>10}")
+    old_total = new_total = 0.0
+    for name, image in images:
+        old_seconds, old_text = timed(old_path, image)
+        new_seconds, new_text = timed(extract_text, image)
+        old_total += old_seconds
+        new_total += new_seconds
+        size = f"{image.width}x{image.height}"
+        print(f"{name[:32]:<32} {size:>11} {old_seconds * 1000:>9.0f} {new_seconds * 1000:>9.0f} "
+              f"{len(old_text.strip()):>10} {len(new_text.strip()):>10}")
+
+    print(f"\nSequential total: old {old_total:.2f}s, new {new_total:.2f}s ({old_total / max(new_total, 1e-9):.1f}x)")
+
+    for label, function in (("old", old_path), ("new", extract_text)):
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(function, [image for _, image in images]))
+        elapsed = time.perf_counter() - started_at
+        print(f"{label} path with {args.concurrency} concurrent requests: {len(images) / elapsed:.2f} images/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Compact, token-budgeted representations of guides and chat history for LLM prompts.
+
+Guides are sent as compact JSON (no indentation), with whitespace collapsed and, for summaries, long
+text fields truncated until the whole input fits its token budget. The render input is never cut,
+since the answer must carry every step in full. Token counts are estimated at ~4 characters
+per token, Gemini's rule of thumb, which is close enough for budgeting without a count_tokens
+round trip. Every compaction records the estimated input tokens saved, per purpose, in stats().
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+# Token budgets per prompt input, and the cap any single text field starts at
+SUMMARY_INPUT_TOKENS = int(os.getenv("PROMPT_SUMMARY_INPUT_TOKENS", "1500"))
+HISTORY_INPUT_TOKENS = int(os.getenv("PROMPT_HISTORY_INPUT_TOKENS", "600"))
+FIELD_TOKENS = int(os.getenv("PROMPT_FIELD_TOKENS", "200"))
+MIN_FIELD_TOKENS = 24
+
+# Keys that only carry media, links or embed markup; they add nothing to a summary
+MEDIA_KEY_PATTERN = re.compile(r"image|img|photo|thumbnail|video|embed|url|link|href|src", re.IGNORECASE)
+URL_PATTERN = re.compile(r"^\s*(https?:)?//\S+\s*$")
+HTML_PATTERN = re.compile(r"<[^>]+>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def truncate(text, max_tokens):
+    """Cuts text to about max_tokens, at a word boundary where there is one; None leaves it whole."""
+    if max_tokens is None:
+        return text
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 1]
+    return f"{cut.rsplit(' ', 1)[0] if ' ' in cut else cut}…"
+
+
+def compact_value(value, field_tokens, drop_media=False):
+    """Collapses whitespace and truncates text fields to field_tokens (None for no cap), dropping empty values.
+
+    Inline HTML tags are stripped from text. Bare URLs and markup blocks (embed codes) are kept
+    whole, since a truncated link or embed is useless, unless drop_media is set, which also drops
+    media/link keys altogether.
+    """
+    if isinstance(value, str):
+        if URL_PATTERN.match(value) or value.lstrip().startswith("<"):
+            if not drop_media:
+                return value.strip()
+            if URL_PATTERN.match(value):
+                return None
+        value = HTML_PATTERN.sub(" ", value)
+        return truncate(WHITESPACE_PATTERN.sub(" ", value).strip(), field_tokens) or None
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            if drop_media and MEDIA_KEY_PATTERN.search(str(key)):
+                continue
+            item = compact_value(item, field_tokens, drop_media)
+            if item not in (None, "", [], {}):
+                compacted[key] = item
+        return compacted
+    if isinstance(value, list):
+        return [item for item in (compact_value(item, field_tokens, drop_media) for item in value) if item not in (None, "", [], {})]
+    return value
+
+
+def record(purpose, tokens_before, tokens_after):
+    with _lock:
+        entry = _stats.setdefault(purpose, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+        entry["calls"] += 1
+        entry["tokens_before"] += tokens_before
+        entry["tokens_after"] += tokens_after
+    logger.debug(f"Compacted {purpose} input: ~{tokens_before} -> ~{tokens_after} tokens ({tokens_before - tokens_after} saved)")
+
+
+def compact_guide(data, max_tokens, purpose, drop_media=False, original=None):
+    """Compact JSON for a guide (or its extracted fields), fitted to max_tokens.
+
+    Text fields are cut further and further until the guide fits; if it still doesn't at
+    MIN_FIELD_TOKENS per field, the JSON itself is cut. With max_tokens=None, only whitespace and
+    markup are compacted and nothing is cut. original is the text the caller used to send, against
+    which the saving is recorded (defaults to the guide as indented JSON).
+    """
+    field_tokens = FIELD_TOKENS if max_tokens is not None else None
+    text = compact_json(compact_value(data, field_tokens, drop_media))
+    while max_tokens is not None and estimate_tokens(text) > max_tokens and field_tokens > MIN_FIELD_TOKENS:
+        field_tokens = max(MIN_FIELD_TOKENS, field_tokens // 2)
+        text = compact_json(compact_value(data, field_tokens, drop_media))
+    text = truncate(text, max_tokens)
+
+    if original is None:
+        original = json.dumps(data, indent=2)
+    record(purpose, estimate_tokens(original), estimate_tokens(text))
+    return text
+
+
+def compact_history(messages, max_tokens=HISTORY_INPUT_TOKENS):
+    """Chat messages ({"type", "content"} dicts, oldest first) as "type: content" lines within max_tokens.
+
+    Every message gets an equal share of the budget; the newest messages are kept if even that doesn't fit.
+    """
+    per_message = max(MIN_FIELD_TOKENS, max_tokens // max(1, len(messages)))
+    lines = [f"{message['type']}: {truncate(WHITESPACE_PATTERN.sub(' ', message['content']).strip(), per_message)}" for message in messages]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    text = "\n".join(lines)
+
+    record("history", estimate_tokens(str(messages)), estimate_tokens(text))
+    return text
+
+
+def stats():
+    """Estimated input tokens before and after compaction, per purpose, since the process started."""
+    with _lock:
+        return {
+            purpose: {**entry, "tokens_saved": entry["tokens_before"] - entry["tokens_after"]}
+            for purpose, entry in _stats.items()
+        }
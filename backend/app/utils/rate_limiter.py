@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket that spaces calls to a requests-per-minute budget."""
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.requests_per_minute = requests_per_minute
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def rate_per_second(self):
+        return self.requests_per_minute / 60.0 if self.requests_per_minute else 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def acquire(self):
+        """Blocks until a request slot is available. A budget of 0 (or None) means unlimited."""
+        if not self.requests_per_minute:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_second
+
+            time.sleep(wait)
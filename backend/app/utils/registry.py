@@ -0,0 +1,174 @@
+"""Process-wide registry of heavy shared resources.
+
+Embedding models, vector stores, LLM clients and Firestore clients are built once, on first use,
+and shared by every module in the process. Call warm_up() before forking worker processes so the
+embedding model weights are loaded once in the master and shared copy-on-write by the workers.
+"""
+import gc
+import os
+import threading
+
+EMBEDDING_MODEL = "BAAI/bge-small-en"
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PERSIST_DIRECTORY = os.path.abspath(os.path.join(current_dir, "..", "..", "data", "vector_database"))
+DEFAULT_FIREBASE_CREDENTIALS_PATH = "app/utils/service-account.json"
+VERTEX_LOCATION = "us-central1"
+
+_resources = {}
+_lock = threading.RLock()
+
+
+def _get_or_create(key, factory):
+    """Returns the resource stored under key, building it with factory() exactly once."""
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = factory()
+                _resources[key] = resource
+    return resource
+
+
+def get_embeddings():
+    def build():
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    return _get_or_create(("embeddings", EMBEDDING_MODEL), build)
+
+
+def get_cached_embeddings():
+    """Embedding model behind an LRU cache for query embeddings; see CachedEmbeddings."""
+    def build():
+        from backend.app.utils.embedding_cache import CachedEmbeddings
+        return CachedEmbeddings(
+            get_embeddings(),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096")),
+            shared_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            max_shared_entries=int(os.getenv("EMBEDDING_CACHE_MAX_SHARED_ENTRIES", "100000"))
+        )
+
+    return _get_or_create(("cached_embeddings", EMBEDDING_MODEL), build)
+
+
+def loaded_cached_embeddings():
+    """The cached embeddings if something already built them, else None (without loading the model)."""
+    return _resources.get(("cached_embeddings", EMBEDDING_MODEL))
+
+
+def get_vector_store(persist_directory=PERSIST_DIRECTORY):
+    def build():
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=persist_directory, embedding_function=get_cached_embeddings())
+
+    return _get_or_create(("vector_store", persist_directory), build)
+
+
+def gemini_client_options():
+    """Client settings pointing the Gemini clients at GEMINI_API_ENDPOINT (e.g. a local fake server), if set."""
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    return {"client_options": {"api_endpoint": endpoint}, "transport": "rest"} if endpoint else {}
+
+
+def get_chat_model(model, **kwargs):
+    """Shared LangChain ChatGoogleGenerativeAI client for the given model and generation settings.
+
+    Retries are left to llm_client, so the client itself makes a single attempt per call.
+    """
+    def build():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        options = {"max_retries": 1, "timeout": float(os.getenv("LLM_TIMEOUT_SECONDS", "60")), **gemini_client_options()}
+        return ChatGoogleGenerativeAI(model=model, **{**options, **kwargs})
+
+    return _get_or_create(("chat_model", model, tuple(sorted(kwargs.items()))), build)
+
+
+def configure_genai():
+    """Configures the google.generativeai SDK once per process."""
+    def build():
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), **gemini_client_options())
+        return True
+
+    return _get_or_create(("genai",), build)
+
+
+def get_generative_model(model):
+    """Shared google.generativeai GenerativeModel for the given model."""
+    def build():
+        import google.generativeai as genai
+        configure_genai()
+        return genai.GenerativeModel(model)
+
+    return _get_or_create(("generative_model", model), build)
+
+
+def init_vertexai():
+    """Initializes the Vertex AI SDK with the service account credentials, once per process."""
+    def build():
+        import vertexai
+        from google.oauth2 import service_account
+
+        credentials = service_account.Credentials.from_service_account_file(os.getenv("SERVICE_ACCOUNT_JSON"))
+        vertexai.init(project=os.getenv("PROJECT_ID"), location=VERTEX_LOCATION, credentials=credentials,
+                      api_endpoint=os.getenv("VERTEX_API_ENDPOINT") or None)
+        return True
+
+    return _get_or_create(("vertexai",), build)
+
+
+def get_vertex_model(model):
+    """Shared Vertex AI GenerativeModel for the given model."""
+    def build():
+        from vertexai.generative_models import GenerativeModel
+        init_vertexai()
+        return GenerativeModel(model)
+
+    return _get_or_create(("vertex_model", model), build)
+
+
+def get_firestore_client():
+    """Shared Firestore client, initializing the Firebase app on first use."""
+    def build():
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(
+                os.getenv("FIREBASE_CREDENTIALS_PATH", DEFAULT_FIREBASE_CREDENTIALS_PATH)
+            ))
+        return firestore.client()
+
+    return _get_or_create(("firestore",), build)
+
+
+def get_async_firestore_client():
+    """Shared Firestore AsyncClient for the asyncio request path, using the Firebase app's credentials.
+
+    Must be first used from the event loop it will run on.
+    """
+    def build():
+        import firebase_admin
+        from google.cloud import firestore
+
+        get_firestore_client()  # Initializes the Firebase app
+        app = firebase_admin.get_app()
+        return firestore.AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
+
+    return _get_or_create(("async_firestore",), build)
+
+
+def warm_up():
+    """Loads fork-safe resources ahead of time, e.g. in a pre-fork server's master process.
+
+    Only the embedding model is loaded here. The Chroma client holds SQLite connections, which must
+    not cross a fork, and gRPC-backed clients (Firestore, Gemini) are not fork-safe either, so they
+    are all still created lazily inside each worker.
+    """
+    get_embeddings()
+
+    # Move everything allocated so far out of the GC's reach, so collections in the workers
+    # don't touch (and copy) the shared pages
+    gc.freeze()
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class SemanticResponseCache:
+    """Caches final responses keyed by query embedding.
+
+    A lookup returns the stored response of the nearest cached query if it lies within max_distance
+    (cosine distance) and mentions exactly the same model numbers/error codes: those embed poorly,
+    so "WM3488HW error OE" and "WM3488HW error UE" can be near-identical vectors. Entries expire after ttl_seconds, the oldest are evicted past max_entries, and
+    everything is dropped when the file at version_path (the vector DB manifest) changes, i.e.
+    whenever the vector DB is regenerated, by this or any other process.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, max_distance=0.05, version_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.version_path = version_path
+        self.version = self._current_version()
+        self.entries = OrderedDict()  # id -> (unit vector, response, expires_at, codes)
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_version(self):
+        if not self.version_path:
+            return None
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _unit(embedding):
+        import numpy as np
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def _check_version(self):
+        version = self._current_version()
+        if version != self.version:
+            self.version = version
+            self.invalidate()
+
+    def lookup(self, embedding, codes=()):
+        """Returns the cached response for the closest query within max_distance with the same codes, or None."""
+        import numpy as np
+
+        self._check_version()
+        query = self._unit(embedding)
+        now = time.time()
+
+        with self.lock:
+            for entry_id in [entry_id for entry_id, entry in self.entries.items() if entry[2] <= now]:
+                del self.entries[entry_id]
+
+            codes = frozenset(codes)
+            ids = [entry_id for entry_id, entry in self.entries.items() if entry[3] == codes]
+            if ids:
+                similarities = np.stack([self.entries[entry_id][0] for entry_id in ids]) @ query
+                best = int(np.argmax(similarities))
+                if 1.0 - float(similarities[best]) <= self.max_distance:
+                    self.entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self.entries[ids[best]][1]
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding, response, codes=()):
+        with self.lock:
+            self.entries[self.next_id] = (self._unit(embedding), response, time.time() + self.ttl_seconds, frozenset(codes))
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries)
+            }
@@ -0,0 +1,73 @@
+"""Reports how long importing the app takes, broken down by module.
+
+Run from the repository root:
+
+    python -m backend.app.utils.startup_report [--module backend.app.api] [--top 25]
+
+The target module is imported in a fresh interpreter with `-X importtime`, so the numbers
+reflect a cold start and aren't skewed by anything this script has already imported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+
+
+def collect_import_times(module):
+    """Imports module in a subprocess and returns [(module name, self us, cumulative us)]."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_root, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        # Still report what was imported before the failure
+        print(f"Importing {module} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}", file=sys.stderr)
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def summarize_by_package(timings):
+    """Sums self time per top-level package."""
+    totals = defaultdict(int)
+    for name, self_us, _ in timings:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down app import time by module.")
+    parser.add_argument("--module", default="backend.app.api", help="module to import (default: backend.app.api)")
+    parser.add_argument("--top", type=int, default=25, help="number of rows to show per table")
+    args = parser.parse_args()
+
+    timings = collect_import_times(args.module)
+    if not timings:
+        print("No import timings collected.")
+        return 1
+
+    total_us = sum(self_us for _, self_us, _ in timings)
+    print(f"Importing {args.module}: {total_us / 1000:.1f} ms across {len(timings)} modules\n")
+
+    print(f"{'package':<40} {'self ms':>10} {'share':>7}")
+    for package, self_us in summarize_by_package(timings)[:args.top]:
+        print(f"{package:<40} {self_us / 1000:>10.1f} {self_us / total_us:>7.1%}")
+
+    print(f"\n{'app module':<60} {'cumulative ms':>14}")
+    app_modules = [timing for timing in timings if timing[0].startswith("backend.")]
+    for name, _, cumulative_us in sorted(app_modules, key=lambda timing: timing[2], reverse=True)[:args.top]:
+        print(f"{name:<60} {cumulative_us / 1000:>14.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class SummaryCache:
+    """Durable SQLite cache for LLM guide summaries, keyed by guide content, prompt and model.
+
+    Entries are evicted least-recently-used first once the stored summaries exceed max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    @property
+    def connection(self):
+        """This process's connection, opened on first use (under self.lock), so none is inherited across a fork."""
+        if self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    @staticmethod
+    def make_key(content, prompt, model):
+        digest = hashlib.sha256()
+        for part in (model, prompt, content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, content, prompt, model):
+        """Returns the cached summary, or None on a miss."""
+        key = self.make_key(content, prompt, model)
+        with self.lock:
+            row = self.connection.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return row[0]
+
+    def put(self, content, prompt, model, summary):
+        key = self.make_key(content, prompt, model)
+        size = len(summary.encode("utf-8"))
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, size, time.time())
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.connection.execute("SELECT key, size FROM summaries ORDER BY last_used ASC").fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+
+        self.connection.executemany("DELETE FROM summaries WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes
+        }
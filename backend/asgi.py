@@ -0,0 +1,33 @@
+"""ASGI entry point.
+
+/main_agent and /main_agent/stream are served by the asyncio pipeline (app/api/agent_async.py);
+every other route is passed through to the Flask app from run.py. Run from the backend directory:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+One worker process handles many concurrent conversations, so a few workers per machine are
+enough. PRELOAD_MODELS is honoured as in run.py.
+"""
+import os
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount, Route
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from run import app as flask_app
+from backend.app.api.agent_async import main_agent, main_agent_stream
+
+app = Starlette(
+    routes=[
+        Route("/main_agent", main_agent, methods=["POST"]),
+        Route("/main_agent/stream", main_agent_stream, methods=["POST"]),
+        Mount("/", app=WsgiToAsgi(flask_app))
+    ],
+    # Same CORS policy as the Flask app (any origin, with credentials)
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])]
+)
@@ -0,0 +1,156 @@
+# STEP TWO
+
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Cleaned guides (output of redundant.py) and the cluster map read by the vector DB build
+INPUT_FOLDER = "../clean_data"
+OUTPUT_FILE = "../duplicate_clusters.json"
+
+# MinHash/LSH settings: 16 bands of 8 rows make pairs above ~0.7 Jaccard likely candidates,
+# which are then kept only if their estimated Jaccard similarity reaches THRESHOLD
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 5
+THRESHOLD = 0.85
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+_random = np.random.RandomState(1)  # Fixed seed, so signatures are comparable across runs
+PERM_A = _random.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _random.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def extract_title(data):
+    """Extracts title from JSON data with fallback logic."""
+    metadata = data.get("metadata") if isinstance(data.get("metadata"), dict) else {}
+    title = metadata.get("title") or metadata.get("guide_title") or data.get("title") or ""
+    return title.strip() if isinstance(title, str) else ""
+
+def text_values(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from text_values(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from text_values(item)
+
+def shingles(text):
+    """Word n-gram shingles. Tokens containing digits (model numbers, step numbers) are collapsed,
+    so the same repair written up for sibling models shingles identically."""
+    words = ["#" if any(char.isdigit() for char in word) else word for word in WORD_PATTERN.findall(text.lower())]
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash(shingle_set):
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingle_set],
+        dtype=np.uint64
+    )
+    # Overflow in a * h wraps around, as in the usual numpy MinHash implementations
+    permuted = np.bitwise_and((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME, MAX_HASH)
+    return permuted.min(axis=1)
+
+def signature_for(path):
+    """Returns (filename, title, content length, MinHash signature or None) for a cleaned guide."""
+    filename = os.path.basename(path)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return filename, "", 0, None
+    if not isinstance(data, dict):
+        return filename, "", 0, None
+
+    title = extract_title(data)
+    steps_text = " ".join(text_values(data.get("steps")))
+    shingle_set = shingles(f"{title} {steps_text}")
+    return filename, title, len(steps_text), minhash(shingle_set) if shingle_set else None
+
+def find_clusters(signatures, threshold=THRESHOLD, bands=BANDS):
+    """Groups filenames whose signatures agree in at least one LSH band and whose estimated
+    Jaccard similarity reaches threshold. Returns a list of clusters with two or more members."""
+    rows = NUM_PERM // bands
+    parent = {filename: filename for filename in signatures}
+
+    def find(filename):
+        while parent[filename] != filename:
+            parent[filename] = parent[parent[filename]]
+            filename = parent[filename]
+        return filename
+
+    checked = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for filename, signature in signatures.items():
+            buckets[signature[band * rows:(band + 1) * rows].tobytes()].append(filename)
+
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    if find(first) != find(second) and np.mean(signatures[first] == signatures[second]) >= threshold:
+                        parent[find(second)] = find(first)
+
+    clusters = defaultdict(list)
+    for filename in signatures:
+        clusters[find(filename)].append(filename)
+    return [sorted(members) for members in clusters.values() if len(members) > 1]
+
+def deduplicate_folder(input_folder, output_file, workers=None, threshold=THRESHOLD):
+    """Clusters near-duplicate guides and writes {canonical: {"duplicates": [...], "aliases": [...]}}.
+
+    The canonical guide of a cluster is the one with the most step text; the other members' titles
+    (which carry their model names) become its aliases.
+    """
+    started_at = time.perf_counter()
+    paths = [os.path.join(input_folder, filename) for filename in sorted(os.listdir(input_folder)) if filename.endswith(".json")]
+
+    titles, lengths, signatures = {}, {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 8))
+        for filename, title, length, signature in executor.map(signature_for, paths, chunksize=chunksize):
+            titles[filename], lengths[filename] = title, length
+            if signature is not None:
+                signatures[filename] = signature
+
+    clusters = {}
+    for members in find_clusters(signatures, threshold):
+        canonical = max(members, key=lambda filename: (lengths[filename], filename))
+        duplicates = [filename for filename in members if filename != canonical]
+        aliases = sorted({titles[filename] for filename in duplicates if titles[filename] and titles[filename] != titles[canonical]})
+        clusters[canonical] = {"duplicates": duplicates, "aliases": aliases}
+
+    temp_path = f"{output_file}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"threshold": threshold, "clusters": clusters}, file, indent=1, ensure_ascii=False)
+    os.replace(temp_path, output_file)
+
+    duplicate_count = sum(len(cluster["duplicates"]) for cluster in clusters.values())
+    print(f"{len(paths)} guides: {len(clusters)} clusters, {duplicate_count} near-duplicates "
+          f"({duplicate_count / len(paths) if paths else 0:.1%}) left out of the index | {time.perf_counter() - started_at:.1f}s")
+    return clusters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clusters near-duplicate cleaned guides so each cluster is indexed once.")
+    parser.add_argument("--input", default=INPUT_FOLDER, help="Folder with the cleaned JSON files")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Where to write the cluster map")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Minimum estimated Jaccard similarity")
+    args = parser.parse_args()
+
+    deduplicate_folder(args.input, args.output, args.workers, args.threshold)
@@ -2,6 +2,10 @@
 
 import os
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Folder containing JSON files
 INPUT_FOLDER = "../raw_data"
@@ -55,36 +59,109 @@ METADATA_KEYS_TO_REMOVE = {
     "other_contributors"
 }
 
-# Ensure output folder exists
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Input hashes of the files cleaned on previous runs, kept in the output folder
+STATE_FILE = ".clean_state"  # No .json suffix, so the vector DB build doesn't take it for a guide
 
-def clean_json_file(input_path, output_path):
+def clean_data(data):
+    if isinstance(data, dict):
+        # Remove unwanted top-level keys
+        data = {k: v for k, v in data.items() if k not in KEYS_TO_REMOVE}
+
+        # Remove unwanted keys inside metadata if present
+        if "metadata" in data and isinstance(data["metadata"], dict):
+            data["metadata"] = {k: v for k, v in data["metadata"].items() if k not in METADATA_KEYS_TO_REMOVE}
+    return data
+
+def clean_json_file(input_path, output_path, previous_hash=None, force=False, indent=None):
+    """Cleans one file. Returns (status, input hash, bytes in, bytes out, error).
+
+    status is "skipped" when the output is newer than the input or the input's content hash is the
+    one recorded on the previous run, "cleaned" when the output was (re)written and "failed" otherwise.
+    """
     try:
-        with open(input_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-
-        if isinstance(data, dict):
-            # Remove unwanted top-level keys
-            data = {k: v for k, v in data.items() if k not in KEYS_TO_REMOVE}
-            
-            # Remove unwanted keys inside metadata if present
-            if "metadata" in data and isinstance(data["metadata"], dict):
-                data["metadata"] = {k: v for k, v in data["metadata"].items() if k not in METADATA_KEYS_TO_REMOVE}
-        
-        # Save the cleaned data to the output folder
-        with open(output_path, "w", encoding="utf-8") as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
-        
-        print(f"Processed: {input_path} -> {output_path}")
+        if not force and os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+            return "skipped", previous_hash, 0, 0, None
+
+        with open(input_path, "rb") as file:
+            raw = file.read()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if not force and content_hash == previous_hash and os.path.exists(output_path):
+            os.utime(output_path)  # Touched but unchanged, so the mtime check skips it next time
+            return "skipped", content_hash, len(raw), 0, None
+
+        data = clean_data(json.loads(raw))
+
+        # Save the cleaned data to the output folder, atomically so an interrupted run leaves no partial file
+        output = json.dumps(data, indent=indent, ensure_ascii=False, separators=None if indent else (",", ":")).encode("utf-8")
+        temp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(output)
+        os.replace(temp_path, output_path)
+
+        return "cleaned", content_hash, len(raw), len(output), None
     except Exception as e:
-        print(f"Error processing {input_path}: {e}")
+        return "failed", previous_hash, 0, 0, f"{input_path}: {e}"
 
-def process_json_folder(input_folder, output_folder):
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".json"):
-            input_path = os.path.join(input_folder, filename)
-            output_path = os.path.join(output_folder, filename)
-            clean_json_file(input_path, output_path)
+def clean_json_file_job(job):
+    return job[0], clean_json_file(*job[1:])
+
+def load_state(output_folder):
+    try:
+        with open(os.path.join(output_folder, STATE_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(output_folder, state):
+    path = os.path.join(output_folder, STATE_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(f"{path}.tmp", path)
+
+def process_json_folder(input_folder, output_folder, workers=None, force=False, indent=None):
+    """Cleans every JSON file of input_folder into output_folder across a process pool and prints a summary."""
+    started_at = time.perf_counter()
+
+    # Ensure output folder exists
+    os.makedirs(output_folder, exist_ok=True)
+    state = load_state(output_folder)
+
+    jobs = [
+        (filename, os.path.join(input_folder, filename), os.path.join(output_folder, filename), state.get(filename), force, indent)
+        for filename in sorted(os.listdir(input_folder)) if filename.endswith(".json")
+    ]
+
+    counts = {"cleaned": 0, "skipped": 0, "failed": 0}
+    bytes_in = bytes_out = 0
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        for filename, (status, content_hash, size_in, size_out, error) in executor.map(clean_json_file_job, jobs, chunksize=chunksize):
+            counts[status] += 1
+            bytes_in += size_in
+            bytes_out += size_out
+            if content_hash:
+                state[filename] = content_hash
+            if error:
+                errors.append(error)
+
+    # Forget files that are no longer in the input folder
+    state = {filename: content_hash for filename, content_hash in state.items() if os.path.exists(os.path.join(input_folder, filename))}
+    save_state(output_folder, state)
+
+    for error in errors:
+        print(f"Error processing {error}")
+    print(f"{len(jobs)} files: {counts['cleaned']} cleaned, {counts['skipped']} unchanged, {counts['failed']} failed | "
+          f"{bytes_in / 1e6:.1f} MB in, {bytes_out / 1e6:.1f} MB out | {time.perf_counter() - started_at:.1f}s")
+    return counts
 
 if __name__ == "__main__":
-    process_json_folder(INPUT_FOLDER, OUTPUT_FOLDER)
+    parser = argparse.ArgumentParser(description="Strips links, statistics and author info from the raw iFixit JSON files.")
+    parser.add_argument("--input", default=INPUT_FOLDER, help="Folder with the raw JSON files")
+    parser.add_argument("--output", default=OUTPUT_FOLDER, help="Folder for the cleaned JSON files")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Re-clean every file, even unchanged ones")
+    parser.add_argument("--indent", type=int, default=None, help="Pretty-print the output with this indent (default: compact)")
+    args = parser.parse_args()
+
+    process_json_folder(args.input, args.output, args.workers, args.force, args.indent)
@@ -10,15 +10,25 @@ logger = logging.getLogger(__name__)
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.app.api import api
+# OCR workers are spawned and re-import this file as __mp_main__ before running their task; they
+# only need backend.app.utils.ocr, so skip building the app, its stores and the model warm-up there
+if __name__ != "__mp_main__":
+    from backend.app.api import api
+    from backend.app.utils.registry import warm_up
 
-app = Flask(__name__)
+    app = Flask(__name__)
 
-# Initializing API
-api.init_app(app)
+    # Initializing API
+    api.init_app(app)
 
-# Enabling CORS with support for credentials
-CORS(app, supports_credentials=True)
+    # Enabling CORS with support for credentials
+    CORS(app, supports_credentials=True)
+
+    # Loading shared models before a pre-fork server (e.g. `gunicorn --preload run:app`) forks its workers,
+    # so they share the model weights copy-on-write instead of loading them once per worker
+    if os.getenv("PRELOAD_MODELS", "false").lower() == "true":
+        logger.info("Warming up shared models before forking workers")
+        warm_up()
 
 if __name__ == '__main__':
     # Logging the start of the application
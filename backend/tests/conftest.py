@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app as the `backend` package, like run.py does
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
@@ -0,0 +1,43 @@
+import os
+
+from backend.app.utils.answer_store import AnswerStore
+from backend.app.utils.index_manifest import hash_bytes
+
+
+def stored_guide(tmp_path, content=b'{"title": "Drain Pump"}'):
+    guide = tmp_path / "guide.json"
+    guide.write_bytes(content)
+    store = AnswerStore(str(tmp_path / "answers" / "rendered_answers.sqlite3"))
+    store.put("guide.json", str(guide), hash_bytes(content), "answer")
+    return store, guide
+
+
+def test_serves_the_answer_for_an_unchanged_guide(tmp_path):
+    store, guide = stored_guide(tmp_path)
+    assert store.get("guide.json", str(guide)) == "answer"
+    assert store.get("other.json", str(guide)) is None
+
+
+def test_touched_guide_with_the_same_content_is_still_served(tmp_path):
+    store, guide = stored_guide(tmp_path)
+    stat = os.stat(guide)
+    os.utime(guide, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert store.get("guide.json", str(guide)) == "answer"
+    assert store.content_hashes() == {"guide.json": hash_bytes(guide.read_bytes())}
+
+
+def test_changed_or_missing_guide_is_not_served(tmp_path):
+    store, guide = stored_guide(tmp_path)
+    guide.write_bytes(b'{"title": "Door Latch"}')
+    assert store.get("guide.json", str(guide)) is None
+
+    guide.unlink()
+    assert store.get("guide.json", str(guide)) is None
+
+
+def test_delete(tmp_path):
+    store, guide = stored_guide(tmp_path)
+    store.delete(["guide.json"])
+    assert store.get("guide.json", str(guide)) is None
+    assert store.content_hashes() == {}
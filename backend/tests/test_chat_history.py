@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.app.utils.chat_history import ChatHistoryStore, InMemoryHistoryBackend
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_recent_returns_the_tail_oldest_first():
+    store = ChatHistoryStore(InMemoryHistoryBackend())
+    for turn in range(4):
+        store.append_turn("s", f"q{turn}", f"a{turn}")
+    store.flush()
+    assert contents(store.recent("s", 3)) == ["a2", "q3", "a3"]
+
+
+def test_own_turns_are_served_before_they_are_persisted():
+    store = ChatHistoryStore(InMemoryHistoryBackend())
+    store.recent("s")  # Caches the (empty) session
+    store.append_turn("s", "q", "a")
+    assert contents(store.recent("s")) == ["q", "a"]
+
+
+def test_turns_written_by_another_worker_are_seen():
+    backend = InMemoryHistoryBackend()
+    first, second = ChatHistoryStore(backend), ChatHistoryStore(backend)
+
+    first.append_turn("s", "q1", "a1").result()
+    assert contents(second.recent("s")) == ["q1", "a1"]
+
+    first.append_turn("s", "q2", "a2").result()
+    assert contents(second.recent("s")) == ["q1", "a1", "q2", "a2"]
+
+
+def test_unchanged_sessions_are_served_from_the_cache():
+    store = ChatHistoryStore(InMemoryHistoryBackend())
+    store.recent("s")
+    store.recent("s")
+    assert store.stats()["hits"] == 1
+
+
+def test_async_reads_match_sync_reads():
+    store = ChatHistoryStore(InMemoryHistoryBackend())
+    store.append_turn("s", "q", "a")
+    store.flush()
+    assert asyncio.run(store.arecent("s")) == store.recent("s")
@@ -0,0 +1,47 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+# The preprocessing scripts aren't a package; import it the way it's run, so worker processes can unpickle it
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "data", "preprocessing"))
+import deduplicate
+
+STEPS = ("Unplug the washer and remove the lower access panel. Place towels under the drain filter, "
+         "turn it counter-clockwise and let the water drain. Remove the three screws holding the drain pump, "
+         "disconnect the wiring harness and the hoses, then install the new pump in reverse order.")
+
+
+def signature(title, steps):
+    return deduplicate.minhash(deduplicate.shingles(f"{title} {steps}"))
+
+
+def test_model_numbers_shingle_identically():
+    assert deduplicate.shingles("LG WM3488HW drain pump") == deduplicate.shingles("LG WM3500CW drain pump")
+
+
+def test_near_duplicates_cluster_and_distinct_guides_dont():
+    signatures = {
+        "wm3488.json": signature("LG WM3488HW Drain Pump Replacement", STEPS),
+        "wm3500.json": signature("LG WM3500CW Drain Pump Replacement", STEPS),
+        "printer.json": signature("Canon PIXMA MG2522 Paper Jam", "Open the rear cover and pull the jammed sheet out slowly."),
+    }
+    assert deduplicate.find_clusters(signatures) == [["wm3488.json", "wm3500.json"]]
+
+
+def test_deduplicate_folder_picks_the_longest_guide_as_canonical(tmp_path):
+    guides = {
+        "short.json": {"title": "LG WM3488HW Drain Pump Replacement", "steps": [STEPS]},
+        "long.json": {"title": "LG WM3500CW Drain Pump Replacement", "steps": [STEPS, "Run a drain cycle to test."]},
+    }
+    for name, data in guides.items():
+        (tmp_path / name).write_text(json.dumps(data), encoding="utf-8")
+
+    output = tmp_path / "clusters.json"
+    clusters = deduplicate.deduplicate_folder(str(tmp_path), str(output), workers=1, threshold=0.5)
+
+    assert clusters == {"long.json": {"duplicates": ["short.json"], "aliases": ["LG WM3488HW Drain Pump Replacement"]}}
+    assert json.loads(output.read_text(encoding="utf-8"))["clusters"] == clusters
@@ -0,0 +1,55 @@
+import io
+import os
+import time
+
+from backend.app.utils.description_cache import DescriptionCache, hash_media
+
+
+def test_hash_media_is_the_same_for_streams_and_bytes_and_rewinds():
+    stream = io.BytesIO(b"media bytes")
+    assert hash_media(stream) == hash_media(b"media bytes")
+    assert stream.tell() == 0
+
+
+def test_description_cache_lru_and_ttl():
+    cache = DescriptionCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")  # Evicts b, the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+
+    expiring = DescriptionCache(ttl_seconds=0)
+    expiring.put("a", "A")
+    assert expiring.get("a") is None
+
+
+def test_description_cache_disk_tier_survives_restarts(tmp_path):
+    DescriptionCache(disk_dir=str(tmp_path)).put("key", "description")
+    cache = DescriptionCache(disk_dir=str(tmp_path))
+    assert cache.get("key") == "description"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_expired_disk_entry_already_removed_elsewhere_is_a_miss(tmp_path):
+    DescriptionCache(disk_dir=str(tmp_path)).put("key", "description")
+    cache = DescriptionCache(ttl_seconds=0, disk_dir=str(tmp_path))
+    path = cache._disk_path("key")
+    os.remove(path)  # Another worker swept it first
+    assert cache._read_disk("key", time.time()) is None
+
+
+def test_disk_sweep_removes_expired_then_oldest_files(tmp_path):
+    cache = DescriptionCache(ttl_seconds=3600, disk_dir=str(tmp_path), sweep_interval=3600)
+    now = time.time()
+    for age, key in ((7200, "expired"), (300, "old"), (200, "middle"), (100, "new")):
+        cache.put(key, "x" * 40)
+        os.utime(cache._disk_path(key), (now - age, now - age))
+    cache.disk_max_bytes = 2 * os.path.getsize(cache._disk_path("new"))  # Room for two descriptions
+
+    cache.sweep_disk(now)
+
+    remaining = {name[:-len(".json")] for shard in os.listdir(tmp_path) for name in os.listdir(tmp_path / shard)}
+    assert remaining == {"middle", "new"}
+    assert cache.stats()["disk_evictions"] == 2
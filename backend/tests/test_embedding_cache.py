@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend.app.utils.embedding_cache import CachedEmbeddings, normalize_query
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_normalized_queries_share_an_entry():
+    assert normalize_query("  My LG washer won't drain!! ") == normalize_query("my lg washer won't drain")
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    model = CountingEmbeddings()
+    CachedEmbeddings(model, shared_path=path).embed_query("washer not draining")
+    other_worker = CachedEmbeddings(model, shared_path=path)
+
+    assert other_worker.embed_query("Washer not draining.") == [19.0, 1.0]
+    assert model.calls == 1
+    assert other_worker.stats()["shared_hits"] == 1
+
+
+def test_shared_tier_evicts_least_recently_used_rows(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = CachedEmbeddings(CountingEmbeddings(), max_entries=1, shared_path=path, max_shared_entries=2)
+    for query in ("a", "b", "a", "c"):  # The second "a" is read back from the shared tier, making "b" the oldest
+        cache.embed_query(query)
+        time.sleep(0.01)
+
+    keys = {row[0] for row in sqlite3.connect(path).execute("SELECT key FROM query_embeddings")}
+    assert keys == {"a", "c"}
+    assert cache.stats()["shared_evictions"] == 1
+
+
+def test_files_from_before_eviction_are_migrated(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    connection.commit()
+    connection.close()
+
+    cache = CachedEmbeddings(CountingEmbeddings(), shared_path=path, max_shared_entries=1)
+    cache.embed_query("a")
+    cache.embed_query("b")
+    assert cache.stats()["shared_evictions"] == 1
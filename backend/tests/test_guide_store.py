@@ -0,0 +1,59 @@
+import json
+import os
+
+from backend.app.utils.guide_store import GuideStore, build_guide_store
+
+
+def write_guides(directory, guides):
+    for name, data in guides.items():
+        (directory / name).write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_build_and_read_back(tmp_path):
+    guides_dir = tmp_path / "clean_data"
+    guides_dir.mkdir()
+    write_guides(guides_dir, {"a.json": {"title": "A", "steps": ["one"]}, "b.json": {"title": "B", "extra": 1}})
+    (guides_dir / "broken.json").write_text("{not json", encoding="utf-8")
+
+    path = str(tmp_path / "store" / "guides.bin")
+    count = build_guide_store(str(guides_dir), path, lambda data: {"title": data["title"]})
+
+    store = GuideStore(path)
+    assert count == 2
+    assert store.get("a.json") == {"title": "A"}
+    assert store.get("b.json") == {"title": "B"}
+    assert store.get("broken.json") is None
+
+
+def test_missing_store_returns_none(tmp_path):
+    assert GuideStore(str(tmp_path / "missing.bin")).get("a.json") is None
+
+
+def test_rebuilt_store_is_picked_up(tmp_path):
+    guides_dir = tmp_path / "clean_data"
+    guides_dir.mkdir()
+    write_guides(guides_dir, {"a.json": {"title": "Old"}})
+    path = str(tmp_path / "guides.bin")
+    build_guide_store(str(guides_dir), path, dict)
+
+    store = GuideStore(path, reload_interval=0)
+    assert store.get("a.json") == {"title": "Old"}
+
+    write_guides(guides_dir, {"a.json": {"title": "New"}})
+    build_guide_store(str(guides_dir), path, dict)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))  # Guard against coarse mtime resolution
+    assert store.get("a.json") == {"title": "New"}
+
+
+def test_decoded_records_are_bounded(tmp_path):
+    guides_dir = tmp_path / "clean_data"
+    guides_dir.mkdir()
+    write_guides(guides_dir, {f"{number}.json": {"title": str(number)} for number in range(5)})
+    path = str(tmp_path / "guides.bin")
+    build_guide_store(str(guides_dir), path, dict)
+
+    store = GuideStore(path, max_decoded=2)
+    for number in range(5):
+        assert store.get(f"{number}.json") == {"title": str(number)}
+    assert list(store.state[4]) == ["3.json", "4.json"]
+    assert store.get("0.json") == {"title": "0"}
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend.app.utils.index_jobs import IndexJobStore, JobCancelled, JobProgress
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def test_claimed_job_stays_active(tmp_path):
+    jobs = IndexJobStore(str(tmp_path))
+    job = jobs.create({"batch_size": 10})
+
+    assert jobs.get(job["id"])["status"] == "queued"
+    assert jobs.active()["id"] == job["id"]
+
+
+def test_released_active_job_is_interrupted(tmp_path):
+    jobs = IndexJobStore(str(tmp_path))
+    job = jobs.create({})
+    jobs.update(job["id"], status="running")
+    jobs.release(job["id"])
+
+    assert jobs.get(job["id"])["status"] == "interrupted"
+    assert jobs.active() is None
+
+
+def test_job_of_a_dead_process_is_interrupted_even_if_its_pid_is_reused(tmp_path):
+    script = (
+        "import os, sys; from backend.app.utils.index_jobs import IndexJobStore; "
+        f"job = IndexJobStore({str(tmp_path)!r}).create({{}}); print(job['id']); sys.stdout.flush(); os._exit(0)"
+    )
+    job_id = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+    jobs = IndexJobStore(str(tmp_path))
+    jobs.update(job_id, pid=os.getpid())  # A live process with the job's PID says nothing about the job
+    assert jobs.get(job_id)["status"] == "interrupted"
+
+
+def test_progress_raises_once_cancelled(tmp_path):
+    jobs = IndexJobStore(str(tmp_path))
+    job = jobs.create({})
+    progress = JobProgress(jobs, job["id"])
+    progress("indexing", 0, 10)
+    assert jobs.get(job["id"])["total"] == 10
+
+    jobs.update(job["id"], status="cancelling")
+    with pytest.raises(JobCancelled):
+        progress("indexing", 5, 10)
@@ -0,0 +1,52 @@
+import pytest
+
+from backend.app.utils.lexical_index import LexicalIndex, extract_codes, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical_index.json"))
+    index.update("lg_washer.json", {"title": "LG WM3488HW Drain Pump Replacement"},
+                 "LG WM3488HW Drain Pump Replacement\nWasher not draining, error OE. Replace the drain pump.")
+    index.update("samsung_tv.json", {"title": "Samsung UN55NU7100 No Picture"},
+                 "Samsung UN55NU7100 No Picture\nTV has sound but no picture. Replace the backlight strips.")
+    index.update("canon_printer.json", {"title": "Canon PIXMA MG2522 Paper Jam"},
+                 "Canon PIXMA MG2522 Paper Jam\nPrinter shows error E03. Clear the feed rollers.")
+    index.save()
+    return index.load()
+
+
+def test_tokenize_joins_hyphenated_model_numbers():
+    assert tokenize("WM-3488 pump") == ["wm3488", "wm", "3488", "pump"]
+
+
+def test_codes_need_a_digit():
+    assert extract_codes("LG TV OE error") == set()
+    assert extract_codes("LG WM3488HW error E03") == {"wm3488hw", "e03"}
+
+
+def test_exact_match_by_model_number(index):
+    assert index.exact_match("my wm3488hw won't drain") == "lg_washer.json"
+    assert index.exact_match("printer says E03") == "canon_printer.json"
+
+
+@pytest.mark.parametrize("query", ["LG dishwasher not draining", "my sony TV has no picture"])
+def test_brand_names_and_acronyms_are_not_exact_hits(index, query):
+    assert index.exact_match(query) is None
+
+
+def test_conflicting_codes_are_not_exact_hits(index):
+    assert index.exact_match("WM3488HW MG2522") is None
+    assert index.exact_match("MG2522 WM3488HW") is None
+
+
+def test_bm25_ranks_the_relevant_guide_first(index):
+    results = index.search("paper stuck in printer rollers")
+    assert results[0][0] == "canon_printer.json"
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_saved_index_round_trips(index, tmp_path):
+    reloaded = LexicalIndex(str(tmp_path / "lexical_index.json")).load()
+    assert reloaded.metadata("samsung_tv.json") == {"title": "Samsung UN55NU7100 No Picture"}
+    assert reloaded.search("backlight")[0][0] == "samsung_tv.json"
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app.utils.deadline import request_budget
+from backend.app.utils.llm_client import CircuitBreaker, CircuitOpen, LLMClient, index_llm_client, llm_client
+
+
+def make_client(**kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("backoff_max", 0.001)
+    return LLMClient(**kwargs)
+
+
+def failing(times, error=ConnectionError):
+    calls = []
+
+    def call_fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= times:
+            raise error("transient")
+        return "ok"
+
+    return call_fn, calls
+
+
+def test_retries_transient_failures_until_success():
+    client = make_client(max_attempts=4)
+    call_fn, calls = failing(2)
+
+    assert client.call(call_fn) == "ok"
+    assert len(calls) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_raises_after_max_attempts():
+    client = make_client(max_attempts=3)
+    call_fn, calls = failing(10)
+
+    with pytest.raises(ConnectionError):
+        client.call(call_fn)
+    assert len(calls) == 3
+    assert client.stats()["failures"] == 1
+
+
+def test_backoff_never_sleeps_past_the_deadline():
+    client = LLMClient(backoff_base=10, backoff_max=30)
+    for attempt in range(1, 6):
+        assert 0 <= client._backoff(attempt, remaining=0.5) <= 0.5
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.before_call()  # The trial call
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # Only one at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast_without_calling():
+    client = make_client(max_attempts=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    with pytest.raises(ConnectionError):
+        client.call(failing(1)[0])
+
+    call_fn, calls = failing(0)
+    with pytest.raises(CircuitOpen):
+        client.call(call_fn)
+    assert calls == []
+    assert client.stats()["rejected"] == 1
+
+
+def test_cancelled_trial_releases_the_half_open_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = make_client(max_attempts=1, breaker=breaker)
+    with pytest.raises(ConnectionError):
+        client.call(failing(1)[0])
+    time.sleep(0.06)
+
+    async def slow(timeout):
+        await asyncio.sleep(5)
+
+    async def cancelled_trial():
+        await asyncio.wait_for(client.acall(slow), 0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cancelled_trial())
+    assert not breaker.trial_in_flight
+    assert client.call(lambda timeout: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_call_timeout_is_capped_by_the_request_budget():
+    client = make_client(timeout=60)
+    with request_budget(5):
+        timeout = client.call(lambda timeout: timeout)
+    assert timeout <= 5
+
+
+def test_exhausted_request_budget_raises_before_calling():
+    client = make_client()
+    with request_budget(0):
+        with pytest.raises(TimeoutError):
+            client.call(lambda timeout: "unreachable")
+
+
+def test_async_call_is_cancelled_at_the_deadline():
+    client = make_client(max_attempts=1, timeout=1)
+
+    async def slow(timeout):
+        await asyncio.sleep(5)
+
+    started_at = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.acall(slow))
+    assert time.monotonic() - started_at < 3
+
+
+def test_index_builds_have_their_own_breaker():
+    assert index_llm_client.breaker is not llm_client.breaker
+
+
+def test_client_errors_are_not_retried():
+    exceptions = pytest.importorskip("google.api_core.exceptions")
+    client = make_client(max_attempts=4)
+    call_fn, calls = failing(10, exceptions.BadRequest)
+
+    with pytest.raises(exceptions.BadRequest):
+        client.call(call_fn)
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def fake_llm_server():
+    """Local stand-in for the Gemini endpoint that answers 503 a set number of times, then a completion."""
+    state = {"unavailable": 0, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state["requests"] += 1
+            if state["requests"] <= state["unavailable"]:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({"candidates": [{"content": {"parts": [{"text": "Replace the drain pump."}]}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_a_fake_llm_server_through_outages(fake_llm_server):
+    endpoint, state = fake_llm_server
+    state["unavailable"] = 2
+    client = make_client(max_attempts=3)
+
+    def generate(timeout):
+        request = urllib.request.Request(f"{endpoint}/v1beta/models/gemini-1.5-flash:generateContent",
+                                         data=b'{"contents": []}', headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)["candidates"][0]["content"]["parts"][0]["text"]
+
+    assert client.call(generate) == "Replace the drain pump."
+    assert state["requests"] == 3
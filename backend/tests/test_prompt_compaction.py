@@ -0,0 +1,30 @@
+import json
+
+from backend.app.utils.prompt_compaction import MIN_FIELD_TOKENS, compact_guide, compact_history, estimate_tokens
+
+GUIDE = {
+    "title": "LG WM3488HW   Drain Pump Replacement",
+    "image": "https://example.com/pump.jpg",
+    "steps": [f"Step {number}: <b>remove</b> screw {number} " + "and keep it somewhere safe " * 40 for number in range(30)]
+}
+
+
+def test_summary_input_fits_its_budget_and_drops_media():
+    text = compact_guide(GUIDE, 500, "summary", drop_media=True)
+    assert estimate_tokens(text) <= 500
+    assert "example.com" not in text
+
+
+def test_render_input_keeps_every_step_whole():
+    data = json.loads(compact_guide(GUIDE, None, "render"))
+    assert data["title"] == "LG WM3488HW Drain Pump Replacement"
+    assert data["image"] == "https://example.com/pump.jpg"
+    assert len(data["steps"]) == len(GUIDE["steps"])
+    assert data["steps"][-1] == " ".join(GUIDE["steps"][-1].replace("<b>", "").replace("</b>", "").split())
+
+
+def test_history_keeps_the_newest_messages():
+    messages = [{"type": "human", "content": f"message {number} " * 50} for number in range(20)]
+    text = compact_history(messages, max_tokens=MIN_FIELD_TOKENS * 3)
+    assert text.splitlines()[-1].startswith("human: message 19")
+    assert estimate_tokens(text) <= MIN_FIELD_TOKENS * 3
@@ -0,0 +1,23 @@
+import time
+
+from backend.app.utils.rate_limiter import RateLimiter
+
+
+def test_zero_budget_is_unlimited():
+    limiter = RateLimiter(0)
+    started_at = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - started_at < 0.5
+
+
+def test_burst_is_served_immediately_then_spaced():
+    limiter = RateLimiter(600, burst=3)  # One request per 0.1s once the burst is used
+    started_at = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - started_at < 0.05
+
+    limiter.acquire()
+    limiter.acquire()
+    assert time.monotonic() - started_at >= 0.15
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.app.utils.response_cache import SemanticResponseCache
+
+
+def test_semantic_response_cache(tmp_path):
+    manifest = tmp_path / "index_manifest.json"
+    manifest.write_text("{}")
+    cache = SemanticResponseCache(max_distance=0.05, version_path=str(manifest))
+    cache.store([1.0, 0.0], "answer")
+
+    assert cache.lookup([0.99, 0.01]) == "answer"
+    assert cache.lookup([0.0, 1.0]) is None
+
+    manifest.write_text('{"regenerated": true}')
+    os.utime(manifest, ns=(0, os.stat(manifest).st_mtime_ns + 1))
+    assert cache.lookup([1.0, 0.0]) is None  # The vector DB changed, so every entry is dropped
+
+
+def test_semantic_response_cache_requires_the_same_codes():
+    cache = SemanticResponseCache(max_distance=0.05)
+    cache.store([1.0, 0.0], "OE answer", {"wm3488hw", "oe"})
+
+    assert cache.lookup([1.0, 0.0], {"wm3488hw", "ue"}) is None
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.99, 0.01], {"oe", "wm3488hw"}) == "OE answer"
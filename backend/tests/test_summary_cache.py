@@ -0,0 +1,25 @@
+import time
+
+from backend.app.utils.summary_cache import SummaryCache
+
+
+def test_summary_cache_key_covers_prompt_and_model(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite3"))
+    cache.put("guide", "prompt", "model", "summary")
+    assert cache.get("guide", "prompt", "model") == "summary"
+    assert cache.get("guide", "other prompt", "model") is None
+    assert cache.get("guide", "prompt", "other model") is None
+
+
+def test_summary_cache_evicts_least_recently_used(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite3"), max_bytes=10)
+    cache.put("a", "p", "m", "12345")
+    time.sleep(0.01)
+    cache.put("b", "p", "m", "12345")
+    time.sleep(0.01)
+    cache.get("a", "p", "m")
+    time.sleep(0.01)
+    cache.put("c", "p", "m", "12345")
+    assert cache.get("b", "p", "m") is None
+    assert cache.get("a", "p", "m") == "12345"
+    assert cache.stats()["evictions"] == 1